@@ -7,7 +7,172 @@ Defines function that initializes cluster centroids for K-means
 import numpy as np
 
 
-def initialize(X, k):
+def row_norms(X, dtype=None, max_memory=2 ** 27):
+    """
+    Calculates the squared norm of each data point in row blocks
+
+    parameters:
+        X [numpy.ndarray or numpy.memmap of shape (n, d)]:
+            contains the dataset
+        dtype [numpy.dtype]:
+            the floating type of the result, if None it follows the policy
+                of the clustering package: float32 data stays float32 and
+                anything else is computed in float64
+        max_memory [positive int]:
+            the approximate number of bytes read from X at once
+
+    returns:
+        [numpy.ndarray of shape (n,)]:
+            containing the squared norm of each data point
+    """
+    if dtype is None:
+        dtype = np.result_type(X.dtype, np.float32)
+    n, d = X.shape
+    block_size = max(1, int(max_memory // (d * np.dtype(dtype).itemsize)))
+    X_sq = np.empty(n, dtype=dtype)
+    for start in range(0, n, block_size):
+        block = np.asarray(X[start:start + block_size], dtype=dtype)
+        X_sq[start:start + block_size] = np.einsum('ij,ij->i', block, block)
+    return X_sq
+
+
+def update_closest(X, X_sq, C, dist, labels, offset=0, max_memory=2 ** 27):
+    """
+    Updates the closest-centroid bookkeeping with newly added centroids
+
+    parameters:
+        X [numpy.ndarray of shape (n, d)]:
+            contains the dataset
+        X_sq [numpy.ndarray of shape (n,)]:
+            contains the squared norm of each data point
+        C [numpy.ndarray of shape (c, d)]:
+            contains the newly added centroids
+        dist [numpy.ndarray of shape (n,)]:
+            contains the squared distance of each data point to its closest
+                centroid so far, updated in place
+        labels [numpy.ndarray of shape (n,)]:
+            contains the index of the closest centroid so far for each
+                data point, updated in place
+        offset [int]:
+            the index of the first centroid of C among all centroids
+        max_memory [positive int]:
+            the approximate number of bytes used by the distance blocks
+    """
+    n = X.shape[0]
+    C_sq = np.einsum('ij,ij->i', C, C)
+    block_size = max(1, int(max_memory // (2 * C.shape[0] * C.itemsize)))
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        D = np.dot(X[start:stop], C.T)
+        D *= -2
+        D += X_sq[start:stop, np.newaxis]
+        D += C_sq
+        np.maximum(D, 0, out=D)
+        best = np.argmin(D, axis=1)
+        best_dist = D[np.arange(stop - start), best]
+        closer = best_dist < dist[start:stop]
+        dist[start:stop][closer] = best_dist[closer]
+        labels[start:stop][closer] = best[closer] + offset
+
+
+def kmeans_plusplus(X, k, weights=None):
+    """
+    Chooses centroids with k-means++ (D^2) sampling
+
+    parameters:
+        X [numpy.ndarray of shape (n, d)]:
+            contains the dataset
+        k [positive int]:
+            contains the number of clusters
+        weights [numpy.ndarray of shape (n,)]:
+            contains the weight of each data point, None for equal weights
+
+    the first centroid is a data point picked at random, every following
+        centroid is a data point picked with probability proportional to
+        its weight times its squared distance to the closest centroid
+
+    returns:
+        [numpy.ndarray of shape (k, d)]:
+            containing the chosen centroids
+    """
+    n = X.shape[0]
+    if weights is None:
+        weights = np.ones(n)
+    X_sq = row_norms(X)
+    dist = np.full(n, np.inf)
+    labels = np.zeros(n, dtype=int)
+    idx = np.empty(k, dtype=int)
+    idx[0] = np.random.choice(n, p=weights / np.sum(weights))
+    for i in range(1, k):
+        update_closest(X, X_sq, X[idx[i - 1:i]], dist, labels)
+        p = weights * dist
+        total = np.sum(p)
+        if total > 0:
+            idx[i] = np.random.choice(n, p=p / total)
+        else:
+            # every point already sits on a centroid
+            idx[i] = np.random.choice(n)
+    return X[idx].astype(np.result_type(X.dtype, np.float32))
+
+
+def kmeans_parallel(X, k, oversampling=None, rounds=5):
+    """
+    Chooses centroids with scalable k-means|| seeding
+
+    parameters:
+        X [numpy.ndarray of shape (n, d)]:
+            contains the dataset
+        k [positive int]:
+            contains the number of clusters
+        oversampling [positive float]:
+            the expected number of candidates drawn per round
+            if None, 2 * k is used
+        rounds [positive int]:
+            the number of sampling rounds
+
+    each round samples every data point independently with probability
+        oversampling * D^2 / sum(D^2), so a few passes over X replace the
+        k sequential passes of k-means++
+    the candidates are then weighted by the number of data points closest
+        to them and reduced to k centroids with weighted k-means++
+
+    returns:
+        [numpy.ndarray of shape (k, d)]:
+            containing the chosen centroids
+    """
+    n = X.shape[0]
+    if oversampling is None:
+        oversampling = 2 * k
+    X_sq = row_norms(X)
+    dist = np.full(n, np.inf)
+    labels = np.zeros(n, dtype=int)
+    candidates = [np.random.choice(n, size=1)]
+    update_closest(X, X_sq, X[candidates[0]], dist, labels)
+    count = 1
+    for r in range(rounds):
+        total = np.sum(dist)
+        if total == 0:
+            break
+        p = np.minimum(1, oversampling * dist / total)
+        new = np.nonzero(np.random.uniform(size=n) < p)[0]
+        if new.size == 0:
+            continue
+        update_closest(X, X_sq, X[new], dist, labels, count)
+        candidates.append(new)
+        count += new.size
+    candidates = np.concatenate(candidates)
+    if candidates.size <= k:
+        # too few candidates to reduce, top up with k-means++ on X
+        extra = kmeans_plusplus(X, k - candidates.size + 1)
+        return np.concatenate((X[candidates], extra[1:])).astype(
+            extra.dtype)
+    weights = np.bincount(labels, minlength=candidates.size).astype(float)
+    # every candidate is its own closest point at least once
+    weights = np.maximum(weights, 1)
+    return kmeans_plusplus(X[candidates], k, weights)
+
+
+def initialize(X, k, init='uniform'):
     """
     Initializes cluster centroids for K-means
 
@@ -18,6 +183,11 @@ def initialize(X, k):
             d: the number of dimensions for each data point
         k [positive int]:
             contains the number of clusters
+        init [str]:
+            the seeding strategy, one of:
+                'uniform': multivariate uniform distribution (default)
+                'k-means++': D^2 sampling of data points
+                'k-means||': scalable oversampled k-means++
 
     cluster centroids initialized with a multivariate uniform distribution
         along each dimension in d:
@@ -33,11 +203,21 @@ def initialize(X, k):
         or None on failure
     """
     # type checks to catch failure
-    if type(X) is not np.ndarray or len(X.shape) != 2:
+    if not isinstance(X, np.ndarray) or len(X.shape) != 2:
         return None
     if type(k) is not int or k <= 0:
         return None
     n, d = X.shape
+    if init == 'k-means++':
+        if k > n:
+            return None
+        return kmeans_plusplus(X, k)
+    if init == 'k-means||':
+        if k > n:
+            return None
+        return kmeans_parallel(X, k)
+    if init != 'uniform':
+        return None
     # min values of X along each dimension in d
     low = np.min(X, axis=0)
     # max values of X along each dimension in d
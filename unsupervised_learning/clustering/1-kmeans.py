@@ -5,9 +5,190 @@ Defines function that performs K-means on a dataset
 
 
 import numpy as np
+initialize = __import__('0-initialize').initialize
+row_norms = __import__('0-initialize').row_norms
 
 
-def kmeans(X, k, iterations=1000):
+def closest(X, C, X_sq=None, block_size=None, max_memory=2 ** 27,
+            return_second=False, C_sq=None):
+    """
+    Assigns each data point to its closest centroid in bounded memory
+
+    parameters:
+        X [numpy.ndarray of shape (n, d)]:
+            contains the dataset
+            n: the number of data points
+            d: the number of dimensions for each data point
+        C [numpy.ndarray of shape (k, d)]:
+            contains the centroid means for each cluster
+        X_sq [numpy.ndarray of shape (n,)]:
+            contains the precomputed squared norm of each data point
+            if None, the norms are computed block by block
+        block_size [positive int]:
+            the number of data points assigned at once
+            if None, it is derived from max_memory
+        max_memory [positive int]:
+            the approximate number of bytes the temporary distance
+                blocks are allowed to use
+        return_second [boolean]:
+            if True, also return the squared distance from each data point
+                to its second closest centroid
+        C_sq [numpy.ndarray of shape (k,)]:
+            contains the precomputed squared norm of each centroid
+            if None, the norms are computed from C
+
+    distances are expanded as ||x||^2 - 2x.c + ||c||^2 so only an
+        (block_size, k) block is ever materialized instead of (n, k, d)
+    points whose two closest centroids are within rounding error of each
+        other are re-checked with exact differences so the labels match
+        numpy.argmin(numpy.linalg.norm(X[:, None] - C, axis=-1), axis=-1)
+
+    returns:
+        clss, dist:
+            clss [numpy.ndarray of shape (n,)]:
+                containing the index of the closest centroid in C
+                    for each data point
+            dist [numpy.ndarray of shape (n,)]:
+                containing the squared distance from each data point
+                    to its closest centroid
+            second [numpy.ndarray of shape (n,)], only if return_second:
+                containing the squared distance from each data point
+                    to its second closest centroid, inf if k is 1
+    """
+    n = X.shape[0]
+    k = C.shape[0]
+    if block_size is None:
+        # the distance block, its partition and the mask live at once
+        block_size = max(1, int(max_memory // (3 * k * C.itemsize)))
+    if C_sq is None:
+        C_sq = np.einsum('ij,ij->i', C, C)
+    C_sq_max = np.max(C_sq)
+    clss = np.empty(n, dtype=int)
+    dist = np.empty(n, dtype=C.dtype)
+    second = np.full(n, np.inf, dtype=C.dtype)
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        block = np.asarray(X[start:stop], dtype=C.dtype)
+        if X_sq is None:
+            block_sq = np.einsum('ij,ij->i', block, block)
+        else:
+            block_sq = X_sq[start:stop]
+        D = np.dot(block, C.T)
+        D *= -2
+        D += block_sq[:, np.newaxis]
+        D += C_sq
+        labels = np.argmin(D, axis=1)
+        best = D[np.arange(stop - start), labels]
+        if k > 1:
+            # expansion error grows with the magnitude of the terms
+            runner_up = np.partition(D, 1, axis=1)[:, 1]
+            eps = 8 * np.finfo(D.dtype).eps * (block_sq + C_sq_max)
+            tied = np.nonzero(runner_up - best <= eps)[0]
+            if tied.size:
+                exact = np.linalg.norm(block[tied][:, np.newaxis] - C,
+                                       axis=-1)
+                labels[tied] = np.argmin(exact, axis=-1)
+                best[tied] = np.min(exact, axis=-1) ** 2
+                runner_up[tied] = np.partition(exact, 1, axis=-1)[:, 1] ** 2
+            second[start:stop] = np.maximum(runner_up, 0)
+        clss[start:stop] = labels
+        dist[start:stop] = np.maximum(best, 0)
+    if return_second:
+        return clss, dist, second
+    return clss, dist
+
+
+def centroid_sums(X, clss, k, max_memory=2 ** 27):
+    """
+    Sums the data points assigned to each cluster with scatter-adds
+
+    parameters:
+        X [numpy.ndarray of shape (n, d)]:
+            contains the dataset
+        clss [numpy.ndarray of shape (n,)]:
+            containing the index of the cluster of each data point
+        k [positive int]:
+            contains the number of clusters
+        max_memory [positive int]:
+            the approximate number of bytes used by the index blocks
+
+    a single pass of numpy.bincount per row block replaces the k boolean
+        mask passes over X
+
+    returns:
+        sums, counts:
+            sums [numpy.ndarray of shape (k, d)]:
+                containing the sum of the data points in each cluster
+            counts [numpy.ndarray of shape (k,)]:
+                containing the number of data points in each cluster
+    """
+    n, d = X.shape
+    block_size = max(1, int(max_memory // (16 * d)))
+    offsets = np.arange(d)
+    sums = np.zeros(k * d)
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        idx = clss[start:stop, np.newaxis] * d + offsets
+        sums += np.bincount(idx.ravel(), weights=X[start:stop].ravel(),
+                            minlength=k * d)
+    counts = np.bincount(clss, minlength=k)
+    return sums.reshape(k, d), counts
+
+
+def hamerly(X, X_sq, C, clss, upper, lower, max_memory=2 ** 27):
+    """
+    Reassigns only the data points whose closest centroid may have changed
+
+    parameters:
+        X [numpy.ndarray of shape (n, d)]:
+            contains the dataset
+        X_sq [numpy.ndarray of shape (n,)]:
+            contains the squared norm of each data point
+        C [numpy.ndarray of shape (k, d)]:
+            contains the current centroid means for each cluster
+        clss [numpy.ndarray of shape (n,)]:
+            containing the current cluster of each data point,
+                updated in place
+        upper [numpy.ndarray of shape (n,)]:
+            containing an upper bound of the distance from each data point
+                to its assigned centroid, updated in place
+        lower [numpy.ndarray of shape (n,)]:
+            containing a lower bound of the distance from each data point
+                to every other centroid, updated in place
+
+    a data point cannot change cluster while its upper bound is below
+        both its lower bound and half the distance from its centroid to
+        the closest other centroid; the upper bound is first tightened
+        with one exact distance, and only the remaining points are
+        compared against every centroid
+    """
+    k, d = C.shape
+    step = max(1, int(max_memory // (3 * max(k, d) * C.itemsize)))
+    C_sq = np.einsum('ij,ij->i', C, C)
+    between = np.dot(C, C.T)
+    between *= -2
+    between += C_sq[:, np.newaxis]
+    between += C_sq
+    np.fill_diagonal(between, np.inf)
+    half = 0.5 * np.sqrt(np.maximum(np.min(between, axis=1), 0))
+    bound = np.maximum(half[clss], lower)
+    moved = np.nonzero(upper > bound)[0]
+    for start in range(0, moved.size, step):
+        idx = moved[start:start + step]
+        diff = X[idx] - C[clss[idx]]
+        upper[idx] = np.sqrt(np.einsum('ij,ij->i', diff, diff))
+    moved = moved[upper[moved] > bound[moved]]
+    for start in range(0, moved.size, step):
+        idx = moved[start:start + step]
+        labels, dist, second = closest(X[idx], C, X_sq[idx],
+                                       return_second=True)
+        clss[idx] = labels
+        upper[idx] = np.sqrt(dist)
+        lower[idx] = np.sqrt(second)
+
+
+def kmeans(X, k, iterations=1000, block_size=None, max_memory=2 ** 27,
+           init='uniform', algorithm='lloyd', return_info=False):
     """
     Performs K-means on a dataset
 
@@ -20,11 +201,33 @@ def kmeans(X, k, iterations=1000):
             contains the number of clusters
         iterations [positive int]:
             contains the maximum number of iterations that should be performed
+        block_size [positive int]:
+            the number of data points assigned to centroids at once
+            if None, it is derived from max_memory
+        max_memory [positive int]:
+            the approximate number of bytes used by the distance blocks
+        init [str or numpy.ndarray of shape (k, d)]:
+            the seeding strategy passed to 0-initialize.initialize
+                ('uniform', 'k-means++' or 'k-means||'),
+                or the initial centroids themselves
+        algorithm [str]:
+            'lloyd' computes every distance at every iteration
+            'hamerly' keeps per-point distance bounds and only reassigns
+                the data points that may have changed cluster
+        return_info [boolean]:
+            if True, also return information about the run
 
     if no change in the cluster centroids occurs between iterations,
         the function should return
 
     initialize the cluster centroids using a multivariate unitform distribution
+        unless another init is given
+
+    assignments are computed by closest in row blocks, so memory stays
+        bounded by max_memory instead of growing with n * k * d
+
+    centroids are updated from scatter-added cluster sums, see
+        centroid_sums
 
     if a cluster contains no data points during the update step,
         its centroid should be reinitialized
@@ -40,31 +243,87 @@ def kmeans(X, k, iterations=1000):
             clss [numpy.ndarray of shape (n,)]:
                 containting the index of the cluster in c
                     that each data point belongs to
-        or None, None on failure
+            info [dict], only if return_info is True:
+                iterations: the number of assignment steps performed
+                inertia: the sum of squared distances of the data points
+                    to their closest centroid
+                sse: the sum of squared distances of the data points
+                    to their centroid, for each cluster
+        or None, None on failure, or None, None, None with return_info
     """
-    if type(X) is not np.ndarray or type(k) is not int:
-        return (None, None)
+    failure = (None, None, None) if return_info else (None, None)
+    if not isinstance(X, np.ndarray) or type(k) is not int:
+        return failure
     if len(X.shape) != 2 or k < 0:
-        return (None, None)
+        return failure
     if type(iterations) is not int or iterations <= 0:
-        return (None, None)
+        return failure
+    if block_size is not None and (type(block_size) is not int or
+                                   block_size <= 0):
+        return failure
+    if type(max_memory) is not int or max_memory <= 0:
+        return failure
+    if algorithm not in ('lloyd', 'hamerly'):
+        return failure
     n, d = X.shape
     if k == 0:
-        return (None, None)
+        return failure
+    # float32 data stays float32, anything else is computed in float64
+    dtype = np.result_type(X.dtype, np.float32)
     low = np.amin(X, axis=0)
     high = np.amax(X, axis=0)
-    C = np.random.uniform(low, high, size=(k, d))
+    if type(init) is np.ndarray:
+        if init.shape != (k, d):
+            return failure
+        C = init.astype(dtype)
+    elif init == 'uniform':
+        C = np.random.uniform(low, high, size=(k, d)).astype(dtype)
+    else:
+        C = initialize(X, k, init)
+        if C is None:
+            return failure
+        C = C.astype(dtype)
+    # row norms never change, so they are computed once for all iterations
+    X_sq = row_norms(X, dtype, max_memory)
+    upper = None
     for i in range(iterations):
-        clss = np.argmin(np.linalg.norm(X[:, None] - C, axis=-1), axis=-1)
+        if upper is not None:
+            hamerly(X, X_sq, C, clss, upper, lower, max_memory)
+        elif algorithm == 'hamerly':
+            clss, dist, second = closest(X, C, X_sq, block_size, max_memory,
+                                         return_second=True)
+            upper, lower = np.sqrt(dist), np.sqrt(second)
+        else:
+            clss, dist = closest(X, C, X_sq, block_size, max_memory)
+        sums, counts = centroid_sums(X, clss, k, max_memory)
         new_C = np.copy(C)
-        for c in range(k):
-            if c not in clss:
-                new_C[c] = np.random.uniform(low, high)
-            else:
-                new_C[c] = np.mean(X[clss == c], axis=0)
+        filled = counts > 0
+        new_C[filled] = sums[filled] / counts[filled, np.newaxis]
+        empty = np.sum(~filled)
+        if empty:
+            new_C[~filled] = np.random.uniform(low, high, size=(empty, d))
         if (new_C == C).all():
-            return (C, clss)
+            break
+        if upper is not None:
+            # every bound stays valid if it moves by the centroid shifts
+            shift = np.sqrt(np.einsum('ij,ij->i', new_C - C, new_C - C))
+            upper += shift[clss]
+            lower -= np.max(shift)
+        C = new_C
+    else:
+        if upper is not None:
+            hamerly(X, X_sq, C, clss, upper, lower, max_memory)
+        else:
+            clss, dist = closest(X, C, X_sq, block_size, max_memory)
+    if return_info:
+        if upper is not None:
+            # the upper bounds are not exact, so expand the final errors
+            sums, counts = centroid_sums(X, clss, k, max_memory)
+            sse = (np.bincount(clss, weights=X_sq, minlength=k) -
+                   2 * np.einsum('ij,ij->i', C, sums) +
+                   counts * np.einsum('ij,ij->i', C, C))
         else:
-            C = new_C
-    clss = np.argmin(np.linalg.norm(X[:, None] - C, axis=-1), axis=-1)
+            sse = np.bincount(clss, weights=dist, minlength=k)
+        return (C, clss, {'iterations': i + 1, 'inertia': np.sum(sse),
+                          'sse': sse})
     return (C, clss)
@@ -4,11 +4,86 @@ Defines function that performs agglomerative clustering on a dataset
 """
 
 
+import numpy as np
 import scipy.cluster.hierarchy as sch
 import matplotlib.pyplot as plt
+MiniBatchKMeans = __import__('13-minibatch_kmeans').MiniBatchKMeans
 
 
-def agglomerative(X, dist):
+def ward_linkage(C, sizes):
+    """
+    Performs Ward linkage on weighted points with the nearest-neighbor chain
+
+    parameters:
+        C [numpy.ndarray of shape (m, d)]:
+            contains the points to cluster, such as K-means centroids
+        sizes [numpy.ndarray of shape (m,)]:
+            contains the number of data points each point stands for
+
+    the Ward distance between clusters u and v is
+        sqrt(2 * n_u * n_v / (n_u + n_v)) * ||c_u - c_v||,
+        which is the distance scipy uses, so unit sizes give the same tree
+        as scipy.cluster.hierarchy.linkage(C, method='ward')
+    only the distances from the head of the chain to the active clusters
+        are computed at each step, so memory stays O(m * d) instead of the
+        O(m^2) condensed distance matrix
+
+    returns:
+        [numpy.ndarray of shape (m - 1, 4)]:
+            containing the linkage matrix in scipy format
+    """
+    m, d = C.shape
+    centers = np.zeros((2 * m - 1, d))
+    centers[:m] = C
+    counts = np.zeros(2 * m - 1)
+    counts[:m] = sizes
+    leaves = np.ones(2 * m - 1)
+    active = np.zeros(2 * m - 1, dtype=bool)
+    active[:m] = True
+    merges = np.zeros((m - 1, 4))
+    chain = []
+    for new in range(m, 2 * m - 1):
+        while True:
+            if not chain:
+                chain.append(int(np.argmax(active)))
+            a = chain[-1]
+            active[a] = False
+            others = np.nonzero(active)[0]
+            diff = centers[others] - centers[a]
+            n_o = counts[others]
+            dist = np.sqrt(2 * counts[a] * n_o / (counts[a] + n_o) *
+                           np.einsum('ij,ij->i', diff, diff))
+            active[a] = True
+            best = int(np.argmin(dist))
+            b = int(others[best])
+            if len(chain) > 1:
+                prev = int(np.searchsorted(others, chain[-2]))
+                # prefer the previous link on ties so the chain terminates
+                if dist[prev] <= dist[best]:
+                    b, best = chain[-2], prev
+            if len(chain) > 1 and b == chain[-2]:
+                break
+            chain.append(b)
+        chain = chain[:-2]
+        total = counts[a] + counts[b]
+        centers[new] = (counts[a] * centers[a] +
+                        counts[b] * centers[b]) / total
+        counts[new] = total
+        leaves[new] = leaves[a] + leaves[b]
+        active[a] = active[b] = False
+        active[new] = True
+        # scipy counts the original points of C, not their weights
+        merges[new - m] = a, b, dist[best], leaves[new]
+    # scipy expects merges sorted by distance with ids in that order
+    order = np.argsort(merges[:, 2], kind='stable')
+    ids = np.arange(2 * m - 1)
+    ids[m + order] = m + np.arange(m - 1)
+    Z = merges[order]
+    Z[:, :2] = np.sort(ids[Z[:, :2].astype(int)], axis=1)
+    return Z
+
+
+def agglomerative(X, dist, plot=True, max_points=None, epochs=3):
     """
     Performs agglomerative clustering on a dataset
 
@@ -19,6 +94,16 @@ def agglomerative(X, dist):
             d: the number of dimensions for each data point
         dist [positive int]:
             the maximum cophenetic distance for all clusters
+        plot [boolean]:
+            if True, display the dendrogram
+            use False for headless batch jobs
+        max_points [positive int]:
+            if not None and n is larger, the data is first summarized by
+                max_points mini-batch K-means centroids, and Ward linkage
+                runs on the centroids weighted by their sizes, so memory
+                no longer grows with n^2
+        epochs [positive int]:
+            the number of mini-batch K-means passes over the data
 
     performs agglomerative clustering with Ward linkage
 
@@ -28,9 +113,21 @@ def agglomerative(X, dist):
         clss [numpy.ndarray of shape (n,)]:
             containing the cluster indices for each data point
     """
-    linkage = sch.linkage(X, method='ward')
-    clss = sch.fcluster(linkage, t=dist, criterion='distance')
-    plt.figure()
-    sch.dendrogram(linkage, color_threshold=dist)
-    plt.show()
+    if max_points is None or X.shape[0] <= max_points:
+        linkage = sch.linkage(X, method='ward')
+        clss = sch.fcluster(linkage, t=dist, criterion='distance')
+    else:
+        summary = MiniBatchKMeans(max_points,
+                                  batch_size=max(1024, max_points))
+        summary.fit(X, epochs)
+        used = summary.counts > 0
+        C = summary.C[used]
+        linkage = ward_linkage(C, summary.counts[used])
+        labels = sch.fcluster(linkage, t=dist, criterion='distance')
+        summary.C = C
+        clss = labels[summary.predict(X)]
+    if plot:
+        plt.figure()
+        sch.dendrogram(linkage, color_threshold=dist)
+        plt.show()
     return clss
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import matplotlib.pyplot as plt
+MiniBatchKMeans = __import__('13-minibatch_kmeans').MiniBatchKMeans
+
+if __name__ == "__main__":
+    np.random.seed(0)
+    a = np.random.multivariate_normal([30, 40], [[16, 0], [0, 16]], size=50)
+    b = np.random.multivariate_normal([10, 25], [[16, 0], [0, 16]], size=50)
+    c = np.random.multivariate_normal([40, 20], [[16, 0], [0, 16]], size=50)
+    d = np.random.multivariate_normal([60, 30], [[16, 0], [0, 16]], size=50)
+    e = np.random.multivariate_normal([20, 70], [[16, 0], [0, 16]], size=50)
+    X = np.concatenate((a, b, c, d, e), axis=0)
+    np.random.shuffle(X)
+    model = MiniBatchKMeans(5, batch_size=50)
+    for block in np.array_split(X, 5):
+        model.partial_fit(block)
+    clss = model.predict(X)
+    print(model.C)
+    print(model.counts)
+    plt.scatter(X[:, 0], X[:, 1], s=10, c=clss)
+    plt.scatter(model.C[:, 0], model.C[:, 1], s=50, marker='*',
+                c=list(range(5)))
+    plt.show()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Defines a class that performs mini-batch K-means on streamed data
+"""
+
+
+import numpy as np
+closest = __import__('1-kmeans').closest
+centroid_sums = __import__('1-kmeans').centroid_sums
+
+
+def batches(data, batch_size=1024):
+    """
+    Yields the rows of a dataset in blocks
+
+    parameters:
+        data [numpy.ndarray, numpy.memmap, str or iterable]:
+            the dataset to read
+            an array (or memory-mapped array) is sliced into row blocks
+            a str is the path to a .npy file, opened memory-mapped
+            any other iterable is expected to yield row blocks itself
+        batch_size [positive int]:
+            the number of rows in each block read from an array
+
+    yields:
+        [numpy.ndarray of shape (b, d)]:
+            the next block of data points
+    """
+    if isinstance(data, str):
+        data = np.load(data, mmap_mode='r')
+    if isinstance(data, np.ndarray):
+        for start in range(0, data.shape[0], batch_size):
+            yield np.asarray(data[start:start + batch_size])
+    else:
+        for block in data:
+            yield np.asarray(block)
+
+
+class MiniBatchKMeans():
+    """
+    Mini-batch K-means that keeps only the centroids and their counts,
+        so memory does not grow with the number of data points seen
+    """
+
+    def __init__(self, k, batch_size=1024, max_memory=2 ** 27):
+        """
+        Class constructor
+
+        parameters:
+            k [positive int]:
+                the number of clusters
+            batch_size [positive int]:
+                the number of rows per block when fitting from an array
+            max_memory [positive int]:
+                the approximate number of bytes used by the distance blocks
+
+        sets the public instance attributes:
+            k: the number of clusters
+            batch_size: the number of rows per block
+            max_memory: the memory budget for the distance blocks
+            C: the centroid means for each cluster, None until fitted
+            counts: the number of data points assigned to each centroid
+        """
+        if type(k) is not int or k <= 0:
+            raise TypeError("k must be a positive integer")
+        if type(batch_size) is not int or batch_size <= 0:
+            raise TypeError("batch_size must be a positive integer")
+        if type(max_memory) is not int or max_memory <= 0:
+            raise TypeError("max_memory must be a positive integer")
+        self.k = k
+        self.batch_size = batch_size
+        self.max_memory = max_memory
+        self.C = None
+        self.counts = np.zeros(k, dtype=int)
+
+    def partial_fit(self, X):
+        """
+        Updates the centroids with one block of data points
+
+        parameters:
+            X [numpy.ndarray of shape (b, d)]:
+                contains the block of data points
+
+        the first block seeds the centroids with k of its points
+        each centroid then moves towards the mean of its assigned points
+            with a learning rate of 1 / (points assigned so far), which
+            makes it the running mean of every point it has been given
+
+        returns:
+            self
+        """
+        X = np.asarray(X, dtype=float)
+        if len(X.shape) != 2:
+            raise ValueError("X must be a 2D numpy.ndarray")
+        if self.C is None:
+            if X.shape[0] < self.k:
+                raise ValueError("the first block must contain at least "
+                                 "k data points")
+            idx = np.random.choice(X.shape[0], self.k, replace=False)
+            self.C = X[idx].copy()
+        elif X.shape[1] != self.C.shape[1]:
+            raise ValueError("X must have the same dimensions as C")
+        clss, _ = closest(X, self.C, max_memory=self.max_memory)
+        sums, n_b = centroid_sums(X, clss, self.k, self.max_memory)
+        self.counts += n_b
+        seen = n_b > 0
+        self.C[seen] += ((sums[seen] - n_b[seen, np.newaxis] * self.C[seen])
+                         / self.counts[seen, np.newaxis])
+        return self
+
+    def fit(self, data, epochs=1):
+        """
+        Fits the centroids on a whole dataset, one block at a time
+
+        parameters:
+            data [numpy.ndarray, numpy.memmap, str or iterable]:
+                the dataset, in any form accepted by batches
+            epochs [positive int]:
+                the number of passes over the data
+                generators can only be consumed once, so use 1 for them
+
+        returns:
+            self
+        """
+        for epoch in range(epochs):
+            for X in batches(data, self.batch_size):
+                self.partial_fit(X)
+        return self
+
+    def predict(self, X):
+        """
+        Finds the closest centroid for each data point
+
+        parameters:
+            X [numpy.ndarray of shape (n, d)]:
+                contains the data points to label
+
+        returns:
+            [numpy.ndarray of shape (n,)]:
+                containing the index of the cluster in C
+                    that each data point belongs to
+        """
+        if self.C is None:
+            raise ValueError("the model must be fitted before predicting")
+        clss, _ = closest(np.asarray(X), self.C, max_memory=self.max_memory)
+        return clss
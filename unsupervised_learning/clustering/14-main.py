@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+
+import numpy as np
+kmeans_restarts = __import__('14-restarts').kmeans_restarts
+
+if __name__ == "__main__":
+    np.random.seed(0)
+    a = np.random.multivariate_normal([30, 40], [[16, 0], [0, 16]], size=50)
+    b = np.random.multivariate_normal([10, 25], [[16, 0], [0, 16]], size=50)
+    c = np.random.multivariate_normal([40, 20], [[16, 0], [0, 16]], size=50)
+    d = np.random.multivariate_normal([60, 30], [[16, 0], [0, 16]], size=50)
+    e = np.random.multivariate_normal([20, 70], [[16, 0], [0, 16]], size=50)
+    X = np.concatenate((a, b, c, d, e), axis=0)
+    np.random.shuffle(X)
+    C, clss, stats = kmeans_restarts(X, 5, n_init=8, workers=2, seed=0)
+    print(C)
+    print(stats['best'])
+    print(np.round(stats['inertia'], 5))
+    print(stats['iterations'])
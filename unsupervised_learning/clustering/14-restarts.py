@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Defines function that performs K-means with several restarts and keeps
+the best solution
+"""
+
+
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+kmeans = __import__('1-kmeans').kmeans
+closest = __import__('1-kmeans').closest
+
+worker_memory = None
+worker_X = None
+
+
+def attach(name, shape, dtype):
+    """
+    Maps the shared dataset into a worker process without copying it
+
+    parameters:
+        name [str]:
+            the name of the shared memory block holding the dataset
+        shape [tuple of int]:
+            the shape of the dataset
+        dtype [numpy.dtype]:
+            the type of the dataset
+    """
+    global worker_memory, worker_X
+    worker_memory = shared_memory.SharedMemory(name=name)
+    worker_X = np.ndarray(shape, dtype=dtype, buffer=worker_memory.buf)
+
+
+def restart(seed, k, iterations, options, X=None):
+    """
+    Runs one K-means initialization
+
+    parameters:
+        seed [list of int]:
+            the seed of the random state for this restart
+        k [positive int]:
+            the number of clusters
+        iterations [positive int]:
+            the maximum number of iterations for K-means
+        options [dict]:
+            extra keyword arguments for K-means
+        X [numpy.ndarray of shape (n, d)]:
+            contains the dataset, the shared copy is used if None
+
+    returns:
+        C, info:
+            C [numpy.ndarray of shape (k, d)]:
+                containing the centroid means found by this restart
+            info [dict]:
+                the K-means information, with the wall time in seconds
+    """
+    if X is None:
+        X = worker_X
+    np.random.seed(seed)
+    start = time.perf_counter()
+    result = kmeans(X, k, iterations, return_info=True, **options)
+    if result[0] is None:
+        return None, None
+    C, clss, info = result
+    info['seconds'] = time.perf_counter() - start
+    return C, info
+
+
+def kmeans_restarts(X, k, n_init=10, iterations=1000, workers=1, seed=None,
+                    **options):
+    """
+    Performs K-means from several initializations and keeps the best one
+
+    parameters:
+        X [numpy.ndarray of shape (n, d)]:
+            contains the dataset that will be used for K-means clustering
+            n: the number of data points
+            d: the number of dimensions for each data point
+        k [positive int]:
+            contains the number of clusters
+        n_init [positive int]:
+            the number of independent initializations
+        iterations [positive int]:
+            the maximum number of iterations for each run
+        workers [positive int]:
+            the number of processes the restarts are spread across
+            the dataset is placed in shared memory once and mapped by
+                every worker instead of being pickled to each of them
+        seed [int]:
+            restart i is seeded with (seed, i)
+            if None, the base seed is drawn from numpy.random
+        options:
+            extra keyword arguments for 1-kmeans.kmeans, such as init or
+                algorithm
+
+    returns:
+        C, clss, stats:
+            C [numpy.ndarray of shape (k, d)]:
+                containing the centroid means of the lowest inertia run
+            clss [numpy.ndarray of shape (n,)]:
+                containing the index of the cluster in C
+                    that each data point belongs to
+            stats [dict]:
+                best: the index of the lowest inertia run
+                inertia: numpy.ndarray of shape (n_init,) with the inertia
+                    of each run
+                iterations: numpy.ndarray of shape (n_init,) with the
+                    number of iterations of each run
+                seconds: numpy.ndarray of shape (n_init,) with the wall
+                    time of each run
+        or None, None, None on failure
+    """
+    if not isinstance(X, np.ndarray) or len(X.shape) != 2:
+        return None, None, None
+    if type(k) is not int or k <= 0:
+        return None, None, None
+    if type(n_init) is not int or n_init <= 0:
+        return None, None, None
+    if type(workers) is not int or workers <= 0:
+        return None, None, None
+    if seed is None:
+        seed = int(np.random.randint(2 ** 31))
+    seeds = [[seed, i] for i in range(n_init)]
+
+    if workers == 1:
+        runs = [restart(s, k, iterations, options, X) for s in seeds]
+    else:
+        size = max(X.nbytes, 1)
+        memory = shared_memory.SharedMemory(create=True, size=size)
+        shared = np.ndarray(X.shape, dtype=X.dtype, buffer=memory.buf)
+        try:
+            shared[...] = X
+            with ProcessPoolExecutor(workers, initializer=attach,
+                                     initargs=(memory.name, X.shape,
+                                               X.dtype)) as pool:
+                runs = list(pool.map(restart, seeds, [k] * n_init,
+                                     [iterations] * n_init,
+                                     [options] * n_init))
+        finally:
+            # the view must be released before the block can be closed
+            del shared
+            memory.close()
+            memory.unlink()
+    if any(C is None for C, info in runs):
+        return None, None, None
+
+    inertia = np.array([info['inertia'] for C, info in runs])
+    best = int(np.argmin(inertia))
+    C = runs[best][0]
+    # the final assignment is recomputed once instead of shipping n labels
+    # back from every run
+    clss, _ = closest(X, C)
+    stats = {'best': best, 'inertia': inertia,
+             'iterations': np.array([info['iterations']
+                                     for C, info in runs]),
+             'seconds': np.array([info['seconds'] for C, info in runs])}
+    return C, clss, stats
@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+
+import numpy as np
+OnlineGMM = __import__('15-online_em').OnlineGMM
+
+if __name__ == '__main__':
+    np.random.seed(11)
+    a = np.random.multivariate_normal([30, 40], [[75, 5], [5, 75]], size=10000)
+    b = np.random.multivariate_normal([5, 25], [[16, 10], [10, 16]], size=750)
+    c = np.random.multivariate_normal([60, 30], [[16, 0], [0, 16]], size=750)
+    d = np.random.multivariate_normal([20, 70], [[35, 10], [10, 35]], size=1000)
+    X = np.concatenate((a, b, c, d), axis=0)
+    np.random.shuffle(X)
+    model = OnlineGMM(4, decay=0.6, batch_size=500).fit(X, epochs=40)
+    print(X.shape[0] * model.pi)
+    print(model.m)
+    print(model.S)
+    print(model.l)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Defines a class that performs online (stepwise) expectation maximization
+for a Gaussian Mixture Model
+"""
+
+
+import numpy as np
+initialize = __import__('4-initialize').initialize
+expectation = __import__('6-expectation').expectation
+statistics = __import__('7-maximization').statistics
+from_statistics = __import__('7-maximization').from_statistics
+batches = __import__('13-minibatch_kmeans').batches
+
+
+class OnlineGMM():
+    """
+    GMM fitted with stepwise EM, which keeps only the sufficient
+        statistics of each cluster instead of the whole dataset and its
+        (k, n) posterior probabilities
+    """
+
+    def __init__(self, k, covariance_type='full', decay=0.7, delay=2.0,
+                 reg=1e-6, batch_size=1024):
+        """
+        Class constructor
+
+        parameters:
+            k [positive int]:
+                the number of clusters
+            covariance_type [str]:
+                the form of the covariance matrices, see 7-maximization
+                    ('full', 'diag', 'tied' or 'spherical')
+            decay [float in (0.5, 1]]:
+                the exponent of the step size
+            delay [float >= 1]:
+                the offset of the step size, larger values make the early
+                    batches weigh less
+            reg [non-negative float]:
+                added to the diagonal of each covariance matrix to keep it
+                    positive definite
+            batch_size [positive int]:
+                the number of rows per block when fitting from an array
+
+        after t batches, the statistics move towards those of the next
+            batch with a step size of (t + delay) ** -decay
+
+        sets the public instance attributes:
+            k, covariance_type, decay, delay, reg, batch_size:
+                the settings above
+            pi, m, S: the priors, means and covariances, None until fitted
+            s0, s1, s2: the running sufficient statistics
+            t: the number of batches seen
+            l: the log likelihood of the last batch
+        """
+        if type(k) is not int or k <= 0:
+            raise TypeError("k must be a positive integer")
+        if covariance_type not in ('full', 'diag', 'tied', 'spherical'):
+            raise ValueError("covariance_type must be one of 'full', "
+                             "'diag', 'tied' or 'spherical'")
+        if not 0.5 < decay <= 1:
+            raise ValueError("decay must be in (0.5, 1]")
+        if delay < 1:
+            raise ValueError("delay must be at least 1")
+        if type(batch_size) is not int or batch_size <= 0:
+            raise TypeError("batch_size must be a positive integer")
+        self.k = k
+        self.covariance_type = covariance_type
+        self.decay = decay
+        self.delay = delay
+        self.reg = reg
+        self.batch_size = batch_size
+        self.pi = self.m = self.S = None
+        self.s0 = self.s1 = self.s2 = None
+        self.t = 0
+        self.l = None
+
+    def partial_fit(self, X):
+        """
+        Updates the model with one block of data points
+
+        parameters:
+            X [numpy.ndarray of shape (b, d)]:
+                contains the block of data points
+
+        the first block initializes the model with 4-initialize
+
+        returns:
+            self
+        """
+        X = np.asarray(X, dtype=float)
+        if len(X.shape) != 2:
+            raise ValueError("X must be a 2D numpy.ndarray")
+        if self.pi is None:
+            if X.shape[0] < self.k:
+                raise ValueError("the first block must contain at least "
+                                 "k data points")
+            self.pi, self.m, self.S = initialize(X, self.k)
+        g, self.l = expectation(X, self.pi, self.m, self.S)
+        if g is None:
+            raise ValueError("the expectation step failed on this block")
+        batch = statistics(X, g, self.covariance_type)
+        if self.t == 0:
+            self.s0, self.s1, self.s2 = batch
+        else:
+            eta = (self.t + self.delay) ** -self.decay
+            self.s0 = (1 - eta) * self.s0 + eta * batch[0]
+            self.s1 = (1 - eta) * self.s1 + eta * batch[1]
+            self.s2 = (1 - eta) * self.s2 + eta * batch[2]
+        self.t += 1
+        self.pi, self.m, self.S = from_statistics(self.s0, self.s1, self.s2,
+                                                  self.covariance_type)
+        self.S += self.reg * np.identity(X.shape[1])
+        return self
+
+    def fit(self, data, epochs=1):
+        """
+        Fits the model on a whole dataset, one block at a time
+
+        parameters:
+            data [numpy.ndarray, numpy.memmap, str or iterable]:
+                the dataset, in any form accepted by
+                    13-minibatch_kmeans.batches
+            epochs [positive int]:
+                the number of passes over the data
+                generators can only be consumed once, so use 1 for them
+
+        returns:
+            self
+        """
+        for epoch in range(epochs):
+            for X in batches(data, self.batch_size):
+                self.partial_fit(X)
+        return self
+
+    def predict(self, X):
+        """
+        Finds the most likely cluster for each data point
+
+        parameters:
+            X [numpy.ndarray of shape (n, d)]:
+                contains the data points to label
+
+        returns:
+            [numpy.ndarray of shape (n,)]:
+                containing the index of the most likely cluster
+                    for each data point
+        """
+        if self.pi is None:
+            raise ValueError("the model must be fitted before predicting")
+        g, l = expectation(np.asarray(X, dtype=float), self.pi, self.m,
+                           self.S)
+        return np.argmax(g, axis=0)
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Defines a class that labels new data points with fitted K-means centroids
+"""
+
+
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+closest = __import__('1-kmeans').closest
+
+
+class KMeansModel():
+    """
+    Fitted K-means centroids that can be saved, loaded and used to label
+        large batches of new data points
+    """
+
+    def __init__(self, C, block_size=65536, workers=1):
+        """
+        Class constructor
+
+        parameters:
+            C [numpy.ndarray of shape (k, d)]:
+                contains the centroid means for each cluster, as returned
+                    by 1-kmeans.kmeans or 10-kmeans.kmeans
+            block_size [positive int]:
+                the number of data points labeled at once by each worker
+            workers [positive int]:
+                the number of threads large batches are split across
+                numpy releases the GIL in matrix products, so the threads
+                    run on separate cores without copying the data
+
+        sets the public instance attributes:
+            C: the centroid means
+            C_sq: the squared norm of each centroid
+            block_size, workers: the settings above
+        """
+        if not isinstance(C, np.ndarray) or len(C.shape) != 2:
+            raise TypeError("C must be a numpy.ndarray of shape (k, d)")
+        if type(block_size) is not int or block_size <= 0:
+            raise TypeError("block_size must be a positive integer")
+        if type(workers) is not int or workers <= 0:
+            raise TypeError("workers must be a positive integer")
+        self.C = C.astype(float)
+        self.C_sq = np.einsum('ij,ij->i', self.C, self.C)
+        self.block_size = block_size
+        self.workers = workers
+
+    def blocks(self, X, function):
+        """
+        Applies a function to each row block of X, in parallel threads
+
+        parameters:
+            X [numpy.ndarray of shape (n, d)]:
+                contains the data points
+            function [callable]:
+                called with a (start, stop) row range
+
+        returns:
+            [list]:
+                the results of function, in row order
+        """
+        if not isinstance(X, np.ndarray) or len(X.shape) != 2:
+            raise TypeError("X must be a numpy.ndarray of shape (n, d)")
+        if X.shape[1] != self.C.shape[1]:
+            raise ValueError("X must have the same dimensions as C")
+        n = X.shape[0]
+        ranges = [(start, min(start + self.block_size, n))
+                  for start in range(0, n, self.block_size)]
+        if self.workers == 1 or len(ranges) == 1:
+            return [function(*r) for r in ranges]
+        with ThreadPoolExecutor(self.workers) as pool:
+            return list(pool.map(lambda r: function(*r), ranges))
+
+    def predict(self, X):
+        """
+        Finds the closest centroid for each data point
+
+        parameters:
+            X [numpy.ndarray of shape (n, d)]:
+                contains the data points to label
+
+        returns:
+            [numpy.ndarray of shape (n,)]:
+                containing the index of the cluster in C
+                    that each data point belongs to
+        """
+        clss = np.empty(X.shape[0], dtype=int)
+
+        def label(start, stop):
+            """Labels one row block in place"""
+            clss[start:stop], _ = closest(X[start:stop], self.C,
+                                          block_size=self.block_size,
+                                          C_sq=self.C_sq)
+
+        self.blocks(X, label)
+        return clss
+
+    def transform(self, X):
+        """
+        Calculates the distance from each data point to each centroid
+
+        parameters:
+            X [numpy.ndarray of shape (n, d)]:
+                contains the data points
+
+        returns:
+            [numpy.ndarray of shape (n, k)]:
+                containing the Euclidean distances to every centroid
+        """
+        D = np.empty((X.shape[0], self.C.shape[0]))
+
+        def distances(start, stop):
+            """Fills the distances of one row block in place"""
+            block = X[start:stop]
+            out = D[start:stop]
+            np.dot(block, self.C.T, out=out)
+            out *= -2
+            out += np.einsum('ij,ij->i', block, block)[:, np.newaxis]
+            out += self.C_sq
+            np.sqrt(np.maximum(out, 0, out=out), out=out)
+
+        self.blocks(X, distances)
+        return D
+
+    def save(self, filename):
+        """
+        Saves the centroids and their norms to a .npz file
+
+        parameters:
+            filename [str]:
+                the file to save to, '.npz' is added if missing
+        """
+        if not filename.endswith('.npz'):
+            filename += '.npz'
+        np.savez(filename, C=self.C, C_sq=self.C_sq)
+
+    @staticmethod
+    def load(filename, block_size=65536, workers=1):
+        """
+        Loads a model saved with save
+
+        parameters:
+            filename [str]:
+                the file to load from
+            block_size, workers:
+                the settings of the loaded model
+
+        returns:
+            the loaded KMeansModel, or None if filename doesn't exist
+        """
+        if not os.path.isfile(filename):
+            return None
+        with np.load(filename) as saved:
+            model = KMeansModel(saved['C'], block_size, workers)
+            model.C_sq = saved['C_sq']
+        return model
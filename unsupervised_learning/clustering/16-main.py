@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import tempfile
+import numpy as np
+kmeans = __import__('1-kmeans').kmeans
+KMeansModel = __import__('16-kmeans_model').KMeansModel
+
+if __name__ == "__main__":
+    np.random.seed(0)
+    a = np.random.multivariate_normal([30, 40], [[16, 0], [0, 16]], size=50)
+    b = np.random.multivariate_normal([10, 25], [[16, 0], [0, 16]], size=50)
+    c = np.random.multivariate_normal([40, 20], [[16, 0], [0, 16]], size=50)
+    d = np.random.multivariate_normal([60, 30], [[16, 0], [0, 16]], size=50)
+    e = np.random.multivariate_normal([20, 70], [[16, 0], [0, 16]], size=50)
+    X = np.concatenate((a, b, c, d, e), axis=0)
+    np.random.shuffle(X)
+    C, clss = kmeans(X, 5)
+    folder = tempfile.mkdtemp()
+    KMeansModel(C).save(os.path.join(folder, 'kmeans'))
+    model = KMeansModel.load(os.path.join(folder, 'kmeans.npz'),
+                             block_size=64, workers=2)
+    shutil.rmtree(folder)
+    print(np.array_equal(model.predict(X), clss))
+    print(np.round(model.transform(X[:5]), 5))
@@ -6,9 +6,10 @@ the total intra-cluster variance for a data set
 
 
 import numpy as np
+closest = __import__('1-kmeans').closest
 
 
-def variance(X, C):
+def variance(X, C, max_memory=2 ** 27):
     """
         A function def variance(X, C): that calculates
         the total intra-cluster variance for a data set
@@ -19,6 +20,10 @@ def variance(X, C):
         C is a numpy.ndarray of shape (k, d) containing
         the centroid means for each cluster
 
+        float32 data is processed in float32, anything else in float64,
+        and the distances are computed in row blocks of about max_memory
+        bytes, so a numpy.memmap larger than memory can be used
+
         Returns:
         - var, or None on failure
         - var is the total variance
@@ -29,7 +34,7 @@ def variance(X, C):
             C.size == 0:
         return None
 
-    dist_diff = np.linalg.norm(X - C[:, np.newaxis], axis=2).T
-    minimum_dist = np.min(dist_diff, axis=1)
-    var = np.sum(np.square(minimum_dist))
+    dtype = np.result_type(X.dtype, np.float32)
+    clss, dist = closest(X, C.astype(dtype), max_memory=max_memory)
+    var = np.sum(dist, dtype=np.float64)
     return var
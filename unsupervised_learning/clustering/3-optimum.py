@@ -5,11 +5,93 @@ Defines function that tests for the optimum number of clusters by variance
 
 
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 kmeans = __import__('1-kmeans').kmeans
-variance = __import__('2-variance').variance
 
+worker_X = None
 
-def optimum_k(X, kmin=1, kmax=None, iterations=1000):
+
+def init_worker(X):
+    """
+    Stores the dataset once per worker process instead of once per task
+
+    the dataset is pickled once per worker by the pool initializer, while
+        a task argument would be pickled again for every task, so the
+        sweep sends tasks with X left as None
+
+    parameters:
+        X [numpy.ndarray of shape (n, d)]:
+            contains the dataset used for K-means clustering
+    """
+    global worker_X
+    worker_X = X
+
+
+def fit_k(k, iterations, seed, X=None, init='uniform'):
+    """
+    Runs K-means for one cluster size
+
+    parameters:
+        k [positive int]:
+            the number of clusters
+        iterations [positive int]:
+            the maximum number of iterations for K-means
+        seed [int]:
+            if not None, the random state is seeded with (seed, k) so each
+                cluster size gets the same result whatever the worker
+        X [numpy.ndarray of shape (n, d)]:
+            contains the dataset, the worker's copy is used if None
+        init [str or numpy.ndarray of shape (k, d)]:
+            the K-means initialization
+
+    returns:
+        C, clss, info:
+            the output of K-means with return_info
+    """
+    if X is None:
+        X = worker_X
+    if seed is not None:
+        np.random.seed([seed, k])
+    return kmeans(X, k, iterations, init=init, return_info=True)
+
+
+def split_worst(X, C, clss, sse):
+    """
+    Builds k + 1 centroids by splitting the cluster with the largest error
+
+    parameters:
+        X [numpy.ndarray of shape (n, d)]:
+            contains the dataset
+        C [numpy.ndarray of shape (k, d)]:
+            contains the centroid means for each cluster
+        clss [numpy.ndarray of shape (n,)]:
+            containing the cluster of each data point
+        sse [numpy.ndarray of shape (k,)]:
+            containing the squared error of each cluster
+
+    the worst centroid is replaced by two centroids placed on either side
+        of it along the principal axis of its cluster, at the mean
+        distance of a half normal distribution
+
+    returns:
+        [numpy.ndarray of shape (k + 1, d)]:
+            containing the centroids to warm start K-means with
+    """
+    worst = np.argmax(sse)
+    points = X[clss == worst]
+    if points.shape[0] < 2:
+        return np.concatenate((C, C[worst:worst + 1]))
+    d = C.shape[1]
+    cov = np.cov(points, rowvar=False, bias=True).reshape(d, d)
+    values, vectors = np.linalg.eigh(cov)
+    offset = np.sqrt(2 * np.maximum(values[-1], 0) / np.pi) * vectors[:, -1]
+    new_C = np.concatenate((C, C[worst:worst + 1] + offset))
+    new_C[worst] -= offset
+    return new_C
+
+
+def optimum_k(X, kmin=1, kmax=None, iterations=1000, workers=1, seed=None,
+              warm_start=False):
     """
     Tests for the optimum number of clusters by variance
 
@@ -24,9 +106,22 @@ def optimum_k(X, kmin=1, kmax=None, iterations=1000):
             containing the maximum number of clusters to check for (inclusive)
         iterations [positive int]:
             containing the maximum number of iterations for K-means
+        workers [positive int]:
+            the number of processes the cluster sizes are spread across
+        seed [int]:
+            if not None, K-means for cluster size k is seeded with
+                (seed, k), so results do not depend on workers
+            if None and workers > 1, a base seed is drawn from numpy.random
+        warm_start [boolean]:
+            if True, K-means for k + 1 clusters starts from the k cluster
+                solution with its worst cluster split in two
+            warm starting chains the cluster sizes, so it runs serially
 
     function should analyze at least 2 different cluster sizes
 
+    the variance of each solution is the inertia reported by K-means,
+        so no second pass over the data is needed
+
     should use at most 2 loops
 
     returns:
@@ -40,6 +135,8 @@ def optimum_k(X, kmin=1, kmax=None, iterations=1000):
     """
     if not isinstance(X, np.ndarray) or len(X.shape) != 2:
         return None, None
+    if kmax is None:
+        kmax = X.shape[0]
     if not isinstance(kmin, int) or kmin <= 0:
         return None, None
     if not isinstance(kmax, int) or kmax <= 0:
@@ -48,17 +145,35 @@ def optimum_k(X, kmin=1, kmax=None, iterations=1000):
         return None, None
     if not isinstance(iterations, int) or iterations <= 0:
         return None, None
-    if kmax is None:
-        kmax = X.shape[0]
+    if not isinstance(workers, int) or workers <= 0:
+        return None, None
+    if seed is not None and not isinstance(seed, int):
+        return None, None
+    if not isinstance(warm_start, bool):
+        return None, None
+
+    ks = range(kmin, kmax + 1)
+    if warm_start:
+        fits = [fit_k(kmin, iterations, seed, X)]
+        for k in ks[1:]:
+            C, clss, info = fits[-1]
+            if C is None:
+                break
+            fits.append(fit_k(k, iterations, seed, X,
+                              split_worst(X, C, clss, info['sse'])))
+    elif workers == 1:
+        fits = [fit_k(k, iterations, seed, X) for k in ks]
+    else:
+        if seed is None:
+            seed = int(np.random.randint(2 ** 31))
+        with ProcessPoolExecutor(workers, initializer=init_worker,
+                                 initargs=(X,)) as pool:
+            fits = list(pool.map(fit_k, ks, [iterations] * len(ks),
+                                 [seed] * len(ks)))
+    if any(fit[0] is None for fit in fits):
+        return None, None
 
-    results = []
-    d_vars = []
-    var = float('inf')
-    for k in range(kmin, kmax + 1):
-        C, clss = kmeans(X, k, iterations)
-        results.append((C, clss))
-        new_var = variance(X, C)
-        if k == kmin:
-            var = new_var
-        d_vars.append(var - new_var)
+    results = [(C, clss) for C, clss, info in fits]
+    var = fits[0][2]['inertia']
+    d_vars = [var - info['inertia'] for C, clss, info in fits]
     return results, d_vars
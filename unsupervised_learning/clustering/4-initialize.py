@@ -8,7 +8,7 @@ import numpy as np
 kmeans = __import__('1-kmeans').kmeans
 
 
-def initialize(X, k):
+def initialize(X, k, init='uniform'):
     """
     Initializes variables for a Gaussian Mixture Model
 
@@ -19,6 +19,9 @@ def initialize(X, k):
             d: the number of dimensions for each data point
         k [positive int]:
             containing the number of clusters
+        init [str]:
+            the seeding strategy used by K-means
+                ('uniform', 'k-means++' or 'k-means||')
 
     not allowed to use any loops
 
@@ -38,7 +41,9 @@ def initialize(X, k):
         return None, None, None
     if type(k) is not int or k <= 0:
         return None, None, None
-    C, clss = kmeans(X, k)
+    C, clss = kmeans(X, k, init=init)
+    if C is None:
+        return None, None, None
     pi = np.full(k, 1 / k)
     m = C
     S = np.tile(np.identity(X.shape[1]), (k, 1, 1))
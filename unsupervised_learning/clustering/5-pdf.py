@@ -25,10 +25,14 @@ def pdf(X, m, S):
     not allowed to use any loops
     not allowed to use the function numpy.diag or method numpy.ndarray.diagonal
 
+    float32 data is processed in float32, anything else in float64
+    to stream a numpy.memmap larger than memory, use Gaussian.logpdf_blocks
+
     returns:
         P [numpy.ndarray of shape (n,)]:
             containing the PDF values for each data point
-            all values in P should have a minimum value of 1e-300
+            all values in P should have a minimum value of 1e-300, or the
+                smallest normal float32 for float32 data
         or None on failure
     """
     if not isinstance(X, np.ndarray) or len(X.shape) != 2:
@@ -40,11 +44,119 @@ def pdf(X, m, S):
     n, d = X.shape
     if d != m.shape[0] or d != S.shape[0] or d != S.shape[1]:
         return None
+    dtype = np.result_type(X.dtype, np.float32)
     S_det = np.linalg.det(S)
-    S_inv = np.linalg.inv(S)
+    S_inv = np.linalg.inv(S).astype(dtype)
     fac = 1 / np.sqrt(((2 * np.pi) ** d) * S_det)
-    X_m = X - m
+    X_m = X - m.astype(dtype)
     X_m_dot = np.dot(X_m, S_inv)
     X_m_dot_X_m = np.sum(X_m_dot * X_m, axis=1)
-    P = fac * np.exp(-0.5 * X_m_dot_X_m)
-    return np.maximum(P, 1e-300)
+    P = (fac * np.exp(-0.5 * X_m_dot_X_m)).astype(dtype, copy=False)
+    return np.maximum(P, max(1e-300, np.finfo(dtype).tiny))
+
+
+class Gaussian():
+    """
+    Multivariate Gaussian distribution with its covariance factorized once,
+        so it can be evaluated against many data points cheaply
+    """
+
+    def __init__(self, m, S):
+        """
+        Class constructor
+
+        parameters:
+            m [numpy.ndarray of shape (d,)]:
+                contains the mean of the distribution
+            S [numpy.ndarray of shape (d, d)]:
+                contains the covariance of the distribution, which must be
+                    positive definite
+
+        sets the public instance attributes:
+            m: the mean of the distribution
+            L: the lower Cholesky factor of S, S = L L^T
+            log_det: the log determinant of S
+            precision: the inverse of S
+        """
+        if not isinstance(m, np.ndarray) or len(m.shape) != 1:
+            raise TypeError("m must be a numpy.ndarray of shape (d,)")
+        d = m.shape[0]
+        if not isinstance(S, np.ndarray) or S.shape != (d, d):
+            raise TypeError("S must be a numpy.ndarray of shape (d, d)")
+        try:
+            self.L = np.linalg.cholesky(S)
+        except np.linalg.LinAlgError:
+            raise ValueError("S must be positive definite")
+        self.m = m
+        self.log_det = 2 * np.sum(np.log(np.diagonal(self.L)))
+        self.__L_inv = np.linalg.inv(self.L)
+        self.precision = np.dot(self.__L_inv.T, self.__L_inv)
+        self.__norm = -0.5 * (d * np.log(2 * np.pi) + self.log_det)
+
+    def logpdf(self, X, block_size=65536):
+        """
+        Calculates the log of the PDF for each data point
+
+        parameters:
+            X [numpy.ndarray of shape (n, d)]:
+                contains the data points
+            block_size [positive int]:
+                the number of data points whitened at once, which bounds
+                    the temporary memory to block_size * d values
+
+        each data point only costs one product with the inverse Cholesky
+            factor, so the cost is linear in n
+        float32 data is processed in float32, anything else in float64,
+            and a numpy.memmap is only read one block at a time
+
+        returns:
+            [numpy.ndarray of shape (n,)]:
+                containing the log PDF values for each data point
+        """
+        if not isinstance(X, np.ndarray) or len(X.shape) != 2:
+            raise TypeError("X must be a numpy.ndarray of shape (n, d)")
+        if X.shape[1] != self.m.shape[0]:
+            raise ValueError("X must have the same dimensions as m")
+        n = X.shape[0]
+        dtype = np.result_type(X.dtype, np.float32)
+        m = self.m.astype(dtype, copy=False)
+        L_inv = self.__L_inv.astype(dtype, copy=False)
+        P = np.empty(n, dtype=dtype)
+        for start in range(0, n, block_size):
+            Y = np.dot(np.asarray(X[start:start + block_size], dtype=dtype) -
+                       m, L_inv.T)
+            P[start:start + block_size] = (self.__norm -
+                                           0.5 * np.einsum('ij,ij->i', Y, Y))
+        return P
+
+    def pdf(self, X, block_size=65536):
+        """
+        Calculates the PDF for each data point
+
+        parameters:
+            X [numpy.ndarray of shape (n, d)]:
+                contains the data points
+            block_size [positive int]:
+                the number of data points whitened at once
+
+        returns:
+            [numpy.ndarray of shape (n,)]:
+                containing the PDF values for each data point
+        """
+        return np.exp(self.logpdf(X, block_size))
+
+    def logpdf_blocks(self, blocks):
+        """
+        Calculates the log of the PDF for a stream of data blocks
+
+        parameters:
+            blocks [iterable of numpy.ndarray of shape (b, d)]:
+                the blocks of data points, such as the row blocks of a
+                    memory-mapped array
+
+        yields:
+            [numpy.ndarray of shape (b,)]:
+                containing the log PDF values for each block
+        """
+        for X in blocks:
+            yield self.logpdf(np.asarray(X))
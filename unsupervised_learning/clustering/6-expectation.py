@@ -6,10 +6,9 @@ for a Gaussian Mixture Model
 
 
 import numpy as np
-pdf = __import__('5-pdf').pdf
 
 
-def expectation(X, pi, m, S):
+def expectation(X, pi, m, S, max_memory=2 ** 24):
     """
     Calculates the expectation step in the EM algorithm for a GMM
 
@@ -24,9 +23,20 @@ def expectation(X, pi, m, S):
             contains the centroid means for each clustern
         S [numpy.ndarray of shape (k, d, d)]:
             contains the covariance matrices for each cluster
+        max_memory [positive int]:
+            the approximate number of bytes of the whitened data of each
+                row block
 
     should only use one loop
 
+    all k covariances are Cholesky factorized once and the log densities
+        of every component are computed as a single (k, n) array, then
+        normalized with logsumexp so high dimensional data does not
+        underflow
+    the data is whitened by every component one row block at a time, so
+        the (k, block, d) temporary stays within max_memory
+    the log densities are computed in float64 whatever the type of X
+
     returns:
         g, l:
             g [numpy.ndarray of shape (k, n)]:
@@ -55,20 +65,38 @@ def expectation(X, pi, m, S):
     if not np.isclose(np.sum(pi), 1):
         return None, None
 
+    # float32 parameters are promoted, so float32 data is whitened in
+    # float64 one block at a time and l is precise enough for tol
+    m = m.astype(float)
     try:
-        g = np.zeros((k, n))
-        for i in range(k):
-            pdf_result = pdf(X, m[i], S[i])
-            if pdf_result is None:
-                return None, None
-            g[i] = pi[i] * pdf_result
-
-        total_likelihood = np.sum(g, axis=0)
-        if np.any(total_likelihood == 0):
-            return None, None
+        # one Cholesky factor per component, S = L L^T
+        L = np.linalg.cholesky(S.astype(float))
+    except np.linalg.LinAlgError:
+        return None, None
+    log_det = 2 * np.sum(np.log(np.diagonal(L, axis1=1, axis2=2)), axis=1)
+    L_inv = np.linalg.inv(L)
+    L_inv_T = np.transpose(L_inv, (0, 2, 1))
+    shift = np.einsum('kij,kj->ki', L_inv, m)[:, np.newaxis, :]
+    rows = min(n, max(1, int(max_memory // (8 * k * d))))
+    maha = np.empty((k, n))
+    # one buffer is reused by every block
+    buffer = np.empty((k, rows, d))
+    for start in range(0, n, rows):
+        block = X[start:start + rows]
+        # whitened block L^-1 (x - m) for every component at once
+        Y = buffer[:, :block.shape[0]]
+        np.matmul(block, L_inv_T, out=Y)
+        Y -= shift
+        maha[:, start:start + rows] = np.einsum('knd,knd->kn', Y, Y)
+    with np.errstate(divide='ignore'):
+        log_pi = np.log(pi)
+    log_p = (log_pi[:, np.newaxis] -
+             0.5 * (d * np.log(2 * np.pi) + log_det[:, np.newaxis] + maha))
 
-        likelihood = np.sum(np.log(total_likelihood))
-        g /= total_likelihood
-        return g, likelihood
-    except Exception as e:
+    # log of the total likelihood of each point with logsumexp
+    top = np.max(log_p, axis=0)
+    if not np.all(np.isfinite(top)):
         return None, None
+    log_total = top + np.log(np.sum(np.exp(log_p - top), axis=0))
+    g = np.exp(log_p - log_total)
+    return g, np.sum(log_total)
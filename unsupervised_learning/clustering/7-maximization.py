@@ -8,7 +8,7 @@ for a Gaussian Mixture Model
 import numpy as np
 
 
-def maximization(X, g):
+def maximization(X, g, covariance_type='full', max_memory=2 ** 27):
     """
     Calculates the maximization step in the EM algorithm for a GMM
 
@@ -17,12 +17,31 @@ def maximization(X, g):
             contains the dataset
             n: the number of data points
             d: the number of dimensions for each data point
+            float32 data is not copied as a whole, each row block is
+                promoted to float64, and a numpy.memmap is only read one
+                row block at a time
         g [numpy.ndarray of shape (k, n)]:
             containing the posterior probabilities for each data point
                 in the cluster
+        covariance_type [str]:
+            the form of the covariance matrices:
+                'full': each cluster has its own covariance matrix
+                'diag': each cluster has its own diagonal covariance matrix
+                'tied': all clusters share the same covariance matrix
+                'spherical': each cluster has its own single variance
+        max_memory [positive int]:
+            the approximate number of bytes used by the temporary arrays
+                of each row block
 
     should only use one loop
 
+    every covariance type is computed for all clusters at once, and the
+        restricted types only cost O(k * n * d)
+    the second moments of each row block, for every covariance type, are
+        centered on the block means and merged with the pairwise update
+        of Chan et al., so splitting X into blocks loses no accuracy and
+        data far from the origin does not cancel catastrophically
+
     returns:
         pi, m, S:
             pi [numpy.ndarray of shape (k,)]:
@@ -31,6 +50,7 @@ def maximization(X, g):
                 containing the updated centroid means for each cluster
             S [numpy.ndarray of shape (k, d, d)]:
                 containing the updated covariance matrices for each cluster
+                in full form, whatever the covariance type
         or None, None, None on failure
     """
     if not isinstance(X, np.ndarray) or len(X.shape) != 2:
@@ -43,10 +63,124 @@ def maximization(X, g):
         return None, None, None
     if not np.isclose(np.sum(g, axis=0), 1).all():
         return None, None, None
-    pi = np.sum(g, axis=1) / n
-    m = np.dot(g, X) / np.sum(g, axis=1)[:, np.newaxis]
-    S = np.zeros((k, d, d))
-    for i in range(k):
-        y = X - m[i]
-        S[i] = np.dot(g[i] * y.T, y) / np.sum(g[i])
+    if covariance_type not in ('full', 'diag', 'tied', 'spherical'):
+        return None, None, None
+    # float32 blocks are promoted, so the moments of float32 data are as
+    # precise as those of float64 data and EM converges just as fast
+    g = g.astype(float, copy=False)
+    rows = max(1, int(max_memory // (2 * k * d * 8)))
+    N = np.zeros(k)
+    m = np.zeros((k, d))
+    if covariance_type == 'full':
+        M2 = np.zeros((k, d, d))
+    elif covariance_type == 'tied':
+        M2 = np.zeros((d, d))
+    else:
+        M2 = np.zeros((k, d))
+    for start in range(0, n, rows):
+        block = np.asarray(X[start:start + rows])
+        g_b = g[:, start:start + rows]
+        N_b = np.sum(g_b, axis=1)
+        # a cluster can hold no weight in a block, its merge is then a no-op
+        seen = np.where(N_b > 0, N_b, 1)
+        m_b = np.dot(g_b, block) / seen[:, np.newaxis]
+        diff = block - m_b[:, np.newaxis, :]
+        weighted = g_b[:, :, np.newaxis] * diff
+        # the correction for the shift between the block and running means
+        delta = m_b - m
+        w = N * N_b / np.where(N + N_b > 0, N + N_b, 1)
+        if covariance_type == 'full':
+            M2 += np.matmul(np.transpose(weighted, (0, 2, 1)), diff)
+            M2 += (w[:, np.newaxis, np.newaxis] *
+                   delta[:, :, np.newaxis] * delta[:, np.newaxis, :])
+        elif covariance_type == 'tied':
+            # the within-cluster scatter, summed over the clusters
+            M2 += np.dot(weighted.reshape(-1, d).T, diff.reshape(-1, d))
+            M2 += np.dot((w[:, np.newaxis] * delta).T, delta)
+        else:
+            M2 += np.einsum('kbd,kbd->kd', weighted, diff)
+            M2 += w[:, np.newaxis] * delta * delta
+        total = N + N_b
+        m += (m_b - m) * (N_b / np.where(total > 0, total, 1))[:, np.newaxis]
+        N = total
+    pi = N / n
+    if covariance_type == 'full':
+        S = M2 / N[:, np.newaxis, np.newaxis]
+    elif covariance_type == 'tied':
+        S = np.tile(M2 / n, (k, 1, 1))
+    else:
+        var = M2 / N[:, np.newaxis]
+        if covariance_type == 'spherical':
+            var = np.tile(np.mean(var, axis=1, keepdims=True), (1, d))
+        S = var[:, :, np.newaxis] * np.identity(d)
+    return pi, m, S
+
+
+def statistics(X, g, covariance_type='full'):
+    """
+    Calculates the per-point sufficient statistics of a GMM
+
+    parameters:
+        X [numpy.ndarray of shape (n, d)]:
+            contains the dataset
+        g [numpy.ndarray of shape (k, n)]:
+            containing the posterior probabilities for each data point
+                in the cluster
+        covariance_type [str]:
+            the form of the covariance matrices, see maximization
+
+    returns:
+        s0, s1, s2:
+            s0 [numpy.ndarray of shape (k,)]:
+                containing sum(g) / n for each cluster
+            s1 [numpy.ndarray of shape (k, d)]:
+                containing sum(g * x) / n for each cluster
+            s2 [numpy.ndarray of shape (k, d, d) or (k, d)]:
+                containing sum(g * x x^T) / n for each cluster, or only its
+                    diagonal for the 'diag' and 'spherical' types
+    """
+    n = X.shape[0]
+    s0 = np.sum(g, axis=1) / n
+    s1 = np.dot(g, X) / n
+    if covariance_type in ('full', 'tied'):
+        s2 = np.matmul(np.transpose(g[:, :, np.newaxis] * X, (0, 2, 1)),
+                       X) / n
+    else:
+        s2 = np.dot(g, X * X) / n
+    return s0, s1, s2
+
+
+def from_statistics(s0, s1, s2, covariance_type='full'):
+    """
+    Calculates the maximization step from sufficient statistics
+
+    parameters:
+        s0, s1, s2:
+            the sufficient statistics, see statistics
+        covariance_type [str]:
+            the form of the covariance matrices, see maximization
+
+    returns:
+        pi, m, S:
+            pi [numpy.ndarray of shape (k,)]:
+                containing the updated priors for each cluster
+            m [numpy.ndarray of shape (k, d)]:
+                containing the updated centroid means for each cluster
+            S [numpy.ndarray of shape (k, d, d)]:
+                containing the updated covariance matrices for each cluster
+    """
+    k, d = s1.shape
+    pi = s0 / np.sum(s0)
+    m = s1 / s0[:, np.newaxis]
+    if covariance_type == 'full':
+        S = (s2 / s0[:, np.newaxis, np.newaxis] -
+             m[:, :, np.newaxis] * m[:, np.newaxis, :])
+    elif covariance_type == 'tied':
+        shared = (np.sum(s2, axis=0) - np.dot((s0[:, np.newaxis] * m).T, m))
+        S = np.tile(shared / np.sum(s0), (k, 1, 1))
+    else:
+        var = np.maximum(s2 / s0[:, np.newaxis] - m * m, 0)
+        if covariance_type == 'spherical':
+            var = np.tile(np.mean(var, axis=1, keepdims=True), (1, d))
+        S = var[:, :, np.newaxis] * np.identity(d)
     return pi, m, S
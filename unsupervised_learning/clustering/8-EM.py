@@ -11,7 +11,8 @@ expectation = __import__('6-expectation').expectation
 maximization = __import__('7-maximization').maximization
 
 
-def expectation_maximization(X, k, iterations=1000, tol=1e-5, verbose=False):
+def expectation_maximization(X, k, iterations=1000, tol=1e-5, verbose=False,
+                             covariance_type='full', return_info=False):
     """
     Performs the expectation maximization (EM) for a GMM
 
@@ -33,6 +34,11 @@ def expectation_maximization(X, k, iterations=1000, tol=1e-5, verbose=False):
                 every 10 iterations and after the last iteration
             {i}: number of iterations of the EM algorithm
             {l}: log likelihood, rounded to 5 decimal places
+        covariance_type [str]:
+            the form of the covariance matrices, see 7-maximization
+                ('full', 'diag', 'tied' or 'spherical')
+        return_info [boolean]:
+            if True, also return information about the run
 
     should only use one loop
 
@@ -48,11 +54,13 @@ def expectation_maximization(X, k, iterations=1000, tol=1e-5, verbose=False):
                 containing probabilities for each data point in each cluster
             l [float]:
                 log likelihood of the model
+            info [dict], only if return_info is True:
+                iterations: the number of EM iterations performed
         or None, None, None, None, None on failure
     """
     if not isinstance(X, np.ndarray):
         return None, None, None, None, None
-    if not isinstance(k, int):
+    if not isinstance(k, int) or k <= 0:
         return None, None, None, None, None
     if not isinstance(iterations, int):
         return None, None, None, None, None
@@ -61,11 +69,32 @@ def expectation_maximization(X, k, iterations=1000, tol=1e-5, verbose=False):
     if not isinstance(verbose, bool):
         return None, None, None, None, None
 
+    if iterations <= 0 or tol < 0:
+        return None, None, None, None, None
+
     pi, m, S = initialize(X, k)
+    if pi is None:
+        return None, None, None, None, None
     g, l = expectation(X, pi, m, S)
     for i in range(iterations):
-        pi, m, S = maximization(X, g)
-        g, l = expectation(X, pi, m, S)
+        if g is None:
+            return None, None, None, None, None
         if verbose and i % 10 == 0:
-            print(f"Log Likelihood after {i} iterations: {l:.5f}")
+            print("Log Likelihood after {} iterations: {}".format(
+                i, round(l, 5)))
+        pi, m, S = maximization(X, g, covariance_type)
+        if pi is None:
+            return None, None, None, None, None
+        l_prev = l
+        g, l = expectation(X, pi, m, S)
+        # stop as soon as the log likelihood has stalled
+        if g is not None and abs(l - l_prev) <= tol:
+            break
+    if g is None:
+        return None, None, None, None, None
+    if verbose:
+        print("Log Likelihood after {} iterations: {}".format(
+            i + 1, round(l, 5)))
+    if return_info:
+        return pi, m, S, g, l, {'iterations': i + 1}
     return pi, m, S, g, l
@@ -5,11 +5,120 @@ the Bayesian Information Criterion (BIC)
 """
 
 
+import hashlib
+import os
+import tempfile
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 expectation_maximization = __import__('8-EM').expectation_maximization
 
+worker_X = None
 
-def BIC(X, kmin=1, kmax=None, iterations=1000, tol=1e-5, verbose=False):
+
+def init_worker(X):
+    """
+    Stores the dataset in a worker process, see 3-optimum.init_worker
+
+    parameters:
+        X [numpy.ndarray of shape (n, d)]:
+            contains the dataset
+    """
+    global worker_X
+    worker_X = X
+
+
+def n_parameters(k, d, covariance_type='full'):
+    """
+    Counts the free parameters of a GMM
+
+    parameters:
+        k [positive int]:
+            the number of clusters
+        d [positive int]:
+            the number of dimensions for each data point
+        covariance_type [str]:
+            the form of the covariance matrices, see 7-maximization
+
+    returns:
+        [int]:
+            k - 1 priors, k * d means and the covariance parameters
+    """
+    covariances = {'full': k * d * (d + 1) // 2,
+                   'diag': k * d,
+                   'tied': d * (d + 1) // 2,
+                   'spherical': k}
+    return (k - 1) + k * d + covariances[covariance_type]
+
+
+def fingerprint(X):
+    """
+    Identifies a dataset by its content
+
+    parameters:
+        X [numpy.ndarray of shape (n, d)]:
+            contains the dataset
+
+    returns:
+        [str]:
+            the SHA-1 digest of the shape, type and bytes of X
+    """
+    digest = hashlib.sha1(str((X.shape, X.dtype.str)).encode())
+    digest.update(np.ascontiguousarray(X).data)
+    return digest.hexdigest()
+
+
+def fit(k, iterations, tol, verbose, covariance_type, seed, cache=None,
+        X=None):
+    """
+    Fits a GMM with k clusters, reusing a cached fit when there is one
+
+    parameters:
+        k [positive int]:
+            the number of clusters
+        iterations, tol, verbose, covariance_type:
+            passed to expectation_maximization
+        seed [int]:
+            if not None, the random state is seeded with (seed, k)
+        cache [str]:
+            the path of the .npz file caching this fit, or None
+        X [numpy.ndarray of shape (n, d)]:
+            contains the dataset, the worker's copy is used if None
+
+    returns:
+        pi, m, S, l:
+            the priors, means, covariances and log likelihood of the fit
+        or None, None, None, None on failure
+    """
+    if cache is not None and os.path.isfile(cache):
+        with np.load(cache) as fitted:
+            return (fitted['pi'], fitted['m'], fitted['S'],
+                    float(fitted['l']))
+    if X is None:
+        X = worker_X
+    if seed is not None:
+        np.random.seed([seed, k])
+    pi, m, S, g, l = expectation_maximization(X, k, iterations, tol,
+                                              verbose, covariance_type)
+    if pi is None:
+        return None, None, None, None
+    if cache is not None:
+        # write to a temporary file first so a crash never leaves a
+        # truncated fit behind, with a unique name so concurrent sweeps
+        # never write to the same file
+        fd, temp = tempfile.mkstemp(suffix='.tmp',
+                                    dir=os.path.dirname(cache))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, pi=pi, m=m, S=S, l=l)
+            os.replace(temp, cache)
+        except BaseException:
+            os.remove(temp)
+            raise
+    return pi, m, S, l
+
+
+def BIC(X, kmin=1, kmax=None, iterations=1000, tol=1e-5, verbose=False,
+        covariance_type='full', workers=1, seed=None, cache_dir=None):
     """
     Find the best number of clusters for a GMM using BIC
 
@@ -29,6 +138,21 @@ def BIC(X, kmin=1, kmax=None, iterations=1000, tol=1e-5, verbose=False):
             the tolerance of the log likelihood, used for early stopping
         verbose [boolean]:
             determines if you should print information about the algorithm
+        covariance_type [str]:
+            the form of the covariance matrices, see 7-maximization
+                ('full', 'diag', 'tied' or 'spherical')
+        workers [positive int]:
+            the number of processes the cluster sizes are spread across
+        seed [int]:
+            if not None, EM for cluster size k is seeded with (seed, k),
+                so results do not depend on workers
+            if None and workers > 1, a base seed is drawn from numpy.random,
+                so the forked workers do not share one random state
+        cache_dir [str]:
+            if not None, the directory where fits are cached as .npz files,
+                keyed by the dataset fingerprint, k, seed and EM settings
+            fits are only cached when seed is not None, since unseeded
+                fits cannot be reproduced
 
     should only use one loop
 
@@ -47,7 +171,7 @@ def BIC(X, kmin=1, kmax=None, iterations=1000, tol=1e-5, verbose=False):
                 contains the log likelihood for each cluster size tested
             b [numpy.ndarray of shape (kmax - kmin + 1)]:
                 contains the BIC value for each cluster size tested
-                BIC = p * ln(n) - 2 * 1
+                BIC = p * ln(n) - 2 * l
                     p: number of parameters required for the model
                     n: number of data points used to create the model
                     l: the log likelihood of the model
@@ -56,6 +180,10 @@ def BIC(X, kmin=1, kmax=None, iterations=1000, tol=1e-5, verbose=False):
     if not isinstance(X, np.ndarray) or len(X.shape) != 2:
         return None, None, None, None
 
+    n, d = X.shape
+    if kmax is None:
+        kmax = n
+
     if not isinstance(kmin, int) or kmin < 1:
         return None, None, None, None
 
@@ -71,24 +199,41 @@ def BIC(X, kmin=1, kmax=None, iterations=1000, tol=1e-5, verbose=False):
     if not isinstance(verbose, bool):
         return None, None, None, None
 
-    if kmax is None:
-        kmax = iterations
-
-    n = X.shape[0]
-    prior_bic = 0
-    likelyhoods = bics = []
-    best_k = kmax
-    pi_prev = m_prev = S_prev = best_res = None
-    for k in range(kmin, kmax + 1):
-        pi, m, S, g, ll = expectation_maximization(X, k, iterations, tol,
-                                                   verbose)
-        bic = k * np.log(n) - 2 * ll
-        if np.isclose(bic, prior_bic) and best_k >= k:
-            best_k = k - 1
-            best_res = pi_prev, m_prev, S_prev
-        pi_prev, m_prev, S_prev = pi, m, S
-        likelyhoods.append(ll)
-        bics.append(bic)
-        prior_bic = bic
-
-    return best_k, best_res, np.asarray(likelyhoods), np.asarray(bics)
+    if covariance_type not in ('full', 'diag', 'tied', 'spherical'):
+        return None, None, None, None
+
+    if not isinstance(workers, int) or workers <= 0:
+        return None, None, None, None
+
+    if seed is not None and not isinstance(seed, int):
+        return None, None, None, None
+
+    ks = list(range(kmin, kmax + 1))
+    caches = [None] * len(ks)
+    if cache_dir is not None and seed is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        prefix = os.path.join(cache_dir, fingerprint(X))
+        caches = ['{}-k{}-s{}-{}-{}-{}.npz'.format(
+            prefix, k, seed, covariance_type, iterations, tol) for k in ks]
+
+    settings = [[iterations] * len(ks), [tol] * len(ks),
+                [verbose] * len(ks), [covariance_type] * len(ks),
+                [seed] * len(ks), caches]
+    if workers == 1:
+        fits = list(map(fit, ks, *settings, [X] * len(ks)))
+    else:
+        if seed is None:
+            settings[4] = [int(np.random.randint(2 ** 31))] * len(ks)
+        with ProcessPoolExecutor(workers, initializer=init_worker,
+                                 initargs=(X,)) as pool:
+            fits = list(pool.map(fit, ks, *settings))
+    if any(pi is None for pi, m, S, ll in fits):
+        return None, None, None, None
+
+    likelihoods = np.array([ll for pi, m, S, ll in fits])
+    p = np.array([n_parameters(k, d, covariance_type) for k in ks])
+    bics = p * np.log(n) - 2 * likelihoods
+    best = int(np.argmin(bics))
+    best_k = ks[best]
+    best_res = fits[best][:3]
+    return best_k, best_res, likelihoods, bics
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the clustering package
+"""
+
+
+import argparse
+import itertools
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+import numpy as np
+kmeans = __import__('1-kmeans').kmeans
+variance = __import__('2-variance').variance
+pdf = __import__('5-pdf').pdf
+expectation = __import__('6-expectation').expectation
+maximization = __import__('7-maximization').maximization
+expectation_maximization = __import__('8-EM').expectation_maximization
+BIC = __import__('9-BIC').BIC
+
+GRIDS = {'small': {'n': [1000, 10000], 'd': [2, 16], 'k': [4, 16]},
+         'large': {'n': [100000, 1000000], 'd': [16, 64], 'k': [16, 64]}}
+
+
+def blobs(n, d, k, spread=1.0, skew=0.0, seed=0):
+    """
+    Generates synthetic Gaussian blobs
+
+    parameters:
+        n [positive int]:
+            the number of data points
+        d [positive int]:
+            the number of dimensions for each data point
+        k [positive int]:
+            the number of blobs
+        spread [positive float]:
+            the standard deviation of each blob
+        skew [non-negative float]:
+            0 gives blobs of equal size, larger values make the sizes
+                decay geometrically by a factor of exp(-skew)
+        seed [int]:
+            the seed of the random generator
+
+    returns:
+        X, clss, means:
+            X [numpy.ndarray of shape (n, d)]:
+                containing the data points
+            clss [numpy.ndarray of shape (n,)]:
+                containing the blob each data point was drawn from
+            means [numpy.ndarray of shape (k, d)]:
+                containing the blob centers
+    """
+    rng = np.random.RandomState(seed)
+    means = rng.uniform(-10 * k ** (1 / d), 10 * k ** (1 / d), size=(k, d))
+    p = np.exp(-skew * np.arange(k))
+    clss = rng.choice(k, size=n, p=p / np.sum(p))
+    X = means[clss] + spread * rng.standard_normal((n, d))
+    return X, clss, means
+
+
+def seeding(n=20000, d=8, k=16, runs=5, skew=0.5, data_seed=1234,
+            inits=('uniform', 'k-means++', 'k-means||')):
+    """
+    Compares K-means seeding strategies on clustered synthetic data
+
+    parameters:
+        n, d, k [positive int]:
+            the size of the data set and the number of clusters
+        runs [positive int]:
+            the number of seeds averaged for each strategy
+        skew [non-negative float]:
+            the size skew of the blobs, see blobs
+        data_seed [int]:
+            the seed of the data set, kept apart from the run seeds
+        inits [tuple of str]:
+            the seeding strategies to compare
+
+    returns:
+        [list of dict]:
+            one entry per strategy with the mean number of iterations to
+                convergence, mean final inertia and mean wall time
+    """
+    X, _, _ = blobs(n, d, k, skew=skew, seed=data_seed)
+    results = []
+    for init in inits:
+        iterations, inertia, seconds = [], [], []
+        for seed in range(runs):
+            np.random.seed(seed)
+            start = time.perf_counter()
+            C, clss, info = kmeans(X, k, init=init, return_info=True)
+            seconds.append(time.perf_counter() - start)
+            if C is None:
+                continue
+            iterations.append(info['iterations'])
+            inertia.append(info['inertia'])
+        results.append({'init': init,
+                        'iterations': float(np.mean(iterations)),
+                        'inertia': float(np.mean(inertia)),
+                        'seconds': float(np.mean(seconds))})
+    return results
+
+
+def timed(function, *args, **kwargs):
+    """
+    Calls a function while recording its wall time
+
+    parameters:
+        function [callable]:
+            the function to call with args and kwargs
+
+    returns:
+        result, seconds:
+            result: the value returned by function
+            seconds [float]: the wall time of the call
+    """
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def peak_memory(function, *args, **kwargs):
+    """
+    Calls a function while recording its peak memory
+
+    parameters:
+        function [callable]:
+            the function to call with args and kwargs
+
+    numpy reports its array allocations to tracemalloc, so the peak
+        includes the temporaries of the numerical kernels
+    tracing slows every allocation down, so the wall time is measured by
+        timed in a separate run
+
+    returns:
+        [int]:
+            the peak number of bytes allocated during the call
+    """
+    tracemalloc.start()
+    try:
+        function(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def cases(X, k, means, spread, clss):
+    """
+    Builds the benchmark case of each clustering routine
+
+    parameters:
+        X [numpy.ndarray of shape (n, d)]:
+            contains the dataset
+        k [positive int]:
+            the number of clusters
+        means [numpy.ndarray of shape (k, d)]:
+            contains the true blob centers
+        spread [float]:
+            the standard deviation of the blobs
+        clss [numpy.ndarray of shape (n,)]:
+            containing the true blob of each data point
+
+    each case returns (iterations, objective), using None when a value
+        does not apply to the routine
+
+    returns:
+        [dict]:
+            the cases, keyed by routine name
+    """
+    n, d = X.shape
+    pi = np.full(k, 1 / k)
+    S = np.tile(spread ** 2 * np.identity(d), (k, 1, 1))
+    g = np.full((k, n), 0.1 / k)
+    g[clss, np.arange(n)] += 0.9
+
+    def run_kmeans():
+        C, labels, info = kmeans(X, k, init='k-means++', return_info=True)
+        if C is None:
+            return None, None
+        return info['iterations'], info['inertia']
+
+    def run_em():
+        result = expectation_maximization(X, k, return_info=True)
+        if result[0] is None:
+            return None, None
+        return result[5]['iterations'], result[4]
+
+    def run_maximization():
+        maximization(X, g)
+        return None, None
+
+    def run_bic():
+        best_k, best, ll, b = BIC(X, 1, k)
+        return None, np.min(b)
+
+    return {'kmeans': run_kmeans,
+            'variance': lambda: (None, variance(X, means)),
+            'pdf': lambda: (None, np.sum(np.log(pdf(X, means[0], S[0])))),
+            'expectation': lambda: (None, expectation(X, pi, means, S)[1]),
+            'maximization': run_maximization,
+            'EM': run_em,
+            'BIC': run_bic}
+
+
+def suite(grid, names=None, repeat=1, seed=0):
+    """
+    Runs every benchmark case over a grid of data set sizes
+
+    parameters:
+        grid [dict]:
+            lists of values for 'n', 'd' and 'k'
+        names [list of str]:
+            the cases to run, see cases, or None for all of them
+        repeat [positive int]:
+            the number of timed runs of each case, the fastest is kept
+        seed [int]:
+            the seed of the data sets and of the random state
+
+    returns:
+        [list of dict]:
+            one record per case and grid point with n, d, k, the wall time
+                in seconds, the peak memory in bytes, the iterations and
+                the final objective
+    """
+    records = []
+    for n, d, k in itertools.product(grid['n'], grid['d'], grid['k']):
+        X, clss, means = blobs(n, d, k, seed=seed)
+        all_cases = cases(X, k, means, 1.0, clss)
+        for name in names or all_cases:
+            best = None
+            for r in range(repeat):
+                np.random.seed(seed)
+                (iterations, objective), seconds = timed(all_cases[name])
+                if best is None or seconds < best['seconds']:
+                    best = {'case': name, 'n': n, 'd': d, 'k': k,
+                            'seconds': seconds,
+                            'iterations': iterations,
+                            'objective': None if objective is None
+                            else float(objective)}
+            # the same seed makes the traced run repeat the timed ones
+            np.random.seed(seed)
+            best['peak_bytes'] = peak_memory(all_cases[name])
+            records.append(best)
+    return records
+
+
+def revision():
+    """
+    Finds the git commit the benchmarks run on
+
+    returns:
+        [str]:
+            the commit hash, or None outside of a git checkout
+    """
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                       stderr=subprocess.DEVNULL,
+                                       universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old, new):
+    """
+    Compares two benchmark reports written by this script
+
+    parameters:
+        old [dict]:
+            the reference report
+        new [dict]:
+            the report to compare against it
+
+    returns:
+        [list of dict]:
+            one entry per record found in both reports with the time and
+                peak memory ratios new / old
+    """
+    key = ('case', 'n', 'd', 'k')
+    reference = {tuple(r[f] for f in key): r for r in old['results']}
+    rows = []
+    for r in new['results']:
+        o = reference.get(tuple(r[f] for f in key))
+        if o is None:
+            continue
+        row = {f: r[f] for f in key}
+        row['time_ratio'] = r['seconds'] / max(o['seconds'], 1e-12)
+        row['memory_ratio'] = r['peak_bytes'] / max(o['peak_bytes'], 1)
+        rows.append(row)
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    commands = parser.add_subparsers(dest='command')
+    commands.add_parser('seeding', help='compare K-means seeding')
+    run = commands.add_parser('run', help='run the benchmark suite')
+    run.add_argument('--grid', choices=sorted(GRIDS), default='small')
+    run.add_argument('--n', type=int, nargs='+')
+    run.add_argument('--d', type=int, nargs='+')
+    run.add_argument('--k', type=int, nargs='+')
+    run.add_argument('--cases', nargs='+')
+    run.add_argument('--repeat', type=int, default=1)
+    run.add_argument('--seed', type=int, default=0)
+    run.add_argument('--output', help='write the JSON report to a file')
+    diff = commands.add_parser('compare', help='compare two JSON reports')
+    diff.add_argument('old')
+    diff.add_argument('new')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        grid = dict(GRIDS[args.grid])
+        for axis in ('n', 'd', 'k'):
+            if getattr(args, axis):
+                grid[axis] = getattr(args, axis)
+        report = {'commit': revision(), 'python': platform.python_version(),
+                  'numpy': np.__version__, 'grid': grid,
+                  'results': suite(grid, args.cases, args.repeat, args.seed)}
+        text = json.dumps(report, indent=2)
+        if args.output:
+            with open(args.output, 'w') as f:
+                f.write(text + '\n')
+        else:
+            print(text)
+    elif args.command == 'compare':
+        with open(args.old) as f:
+            old = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        print('{:>12} {:>8} {:>4} {:>4} {:>7} {:>7}'.format(
+            'case', 'n', 'd', 'k', 'time', 'memory'))
+        for row in compare(old, new):
+            print('{case:>12} {n:>8} {d:>4} {k:>4} {time_ratio:>7.2f} '
+                  '{memory_ratio:>7.2f}'.format(**row))
+    else:
+        print('{:>10} {:>11} {:>14} {:>9}'.format('init', 'iterations',
+                                                  'inertia', 'seconds'))
+        for r in seeding():
+            print('{init:>10} {iterations:>11.1f} {inertia:>14.1f} '
+                  '{seconds:>9.3f}'.format(**r))
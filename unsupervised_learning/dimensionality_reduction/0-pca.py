@@ -6,6 +6,25 @@ Defines the function that performs PCA on a dataset with zero mean.
 import numpy as np
 
 
+def n_components(S, var=0.95):
+    """
+    Finds how many components retain a fraction of the variance.
+
+    Args:
+        S (numpy.ndarray): Singular values of the data, in decreasing order.
+        var (float): Fraction of variance to retain. Defaults to 0.95.
+
+    Returns:
+        tuple: (nd, ratios) the number of components to keep and the
+            variance ratio of each component, of shape (len(S),).
+    """
+    # Calcuate the varience ratios
+    ratios = S / np.sum(S)
+    variance = np.cumsum(ratios)
+    nd = np.argwhere(variance >= var)[0, 0]
+    return nd + 1, ratios
+
+
 def pca(X, var=0.95):
     """
     Performs PCA on a dataset with zero mean.
@@ -17,14 +36,12 @@ def pca(X, var=0.95):
     Returns:
         numpy.ndarray: Weights matrix of shape (d, nd).
     """
-    # Perform Singular Value Decomposition (SVD)
-    U, S, Vt = np.linalg.svd(X)
+    # Perform Singular Value Decomposition (SVD), only the d right
+    # singular vectors are needed so the (n, n) U is never built
+    U, S, Vt = np.linalg.svd(X, full_matrices=False)
 
-    # Calcuate the varience ratios
-    ratios = list(x / np.sum(S) for x in S)
-    variance = np.cumsum(ratios)
-    nd = np.argwhere(variance >= var)[0, 0]
+    nd, _ = n_components(S, var)
 
     # Construct the weight matrix
-    W = Vt.T[:, :(nd + 1)]
+    W = Vt.T[:, :nd]
     return (W)
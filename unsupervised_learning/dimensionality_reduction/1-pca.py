@@ -6,19 +6,67 @@ Defines the function that perfoms PCA on a dataset with dimensionality.
 import numpy as np
 
 
-def pca(X, ndim):
+def randomized_svd(X, mean, ndim, oversamples=10, n_iter=4):
+    """
+    Approximates the top right singular vectors of the centered data.
+
+    Args:
+        X (numpy.ndarray): Dataset of shape (n, d).
+        mean (numpy.ndarray): Mean of each feature, of shape (d,).
+        ndim (int): Number of singular vectors to keep.
+        oversamples (int): Extra random directions that improve accuracy.
+        n_iter (int): Power iterations, which sharpen the spectrum when the
+            singular values decay slowly.
+
+    The data is projected on ndim + oversamples random directions, and the
+    SVD of the small projected matrix gives the components (Halko et al.).
+    The centering is applied as a rank-one correction to each product, so
+    X - mean is never built.
+
+    Returns:
+        tuple: (S, Vt) the ndim largest singular values, of shape (ndim,),
+            and the matching right singular vectors, of shape (ndim, d).
+    """
+    n, d = X.shape
+    k = min(ndim + oversamples, n, d)
+    omega = np.random.normal(size=(d, k))
+    Y = np.dot(X, omega) - np.dot(mean, omega)
+    for _ in range(n_iter):
+        # re-orthonormalize so the power iterations do not lose precision
+        Q, _ = np.linalg.qr(Y)
+        Z = np.dot(X.T, Q) - np.outer(mean, np.sum(Q, axis=0))
+        Z, _ = np.linalg.qr(Z)
+        Y = np.dot(X, Z) - np.dot(mean, Z)
+    Q, _ = np.linalg.qr(Y)
+    B = np.dot(Q.T, X) - np.outer(np.sum(Q, axis=0), mean)
+    _, S, Vt = np.linalg.svd(B, full_matrices=False)
+    return S[:ndim], Vt[:ndim]
+
+
+def pca(X, ndim, method='full'):
     """
     Performs Principal Component Analysis (PCA) on a dataset.
 
     Args:
         X (numpy.ndarray): Dataset of shape (n, d).
         ndim (int): New dimensionality of the transformed data.
+        method (str): 'full' for an exact thin SVD, or 'randomized' for a
+            randomized truncated SVD, which costs O(n * d * ndim) instead of
+            O(n * d * min(n, d)) and is much faster when ndim is far smaller
+            than d. Seed numpy.random for reproducible results.
 
     Returns:
         numpy.ndarray: Transformed data of shape (n, ndim).
     """
     # Center the data by subtracting the mean of each feature
     X_mean = np.mean(X, axis=0)
+
+    if method == 'randomized':
+        _, Vt = randomized_svd(X, X_mean, ndim)
+        # Project first and center after, the projection is much smaller
+        W = Vt.T
+        return np.dot(X, W) - np.dot(X_mean, W)
+
     X_centered = X - X_mean
 
     # Perform Singular Value Decomposition on the centered data
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Defines a class that performs PCA incrementally, one batch of rows at a time.
+"""
+
+import numpy as np
+
+
+class IncrementalPCA():
+    """
+    PCA fitted from row batches, so datasets that do not fit in memory,
+    such as memory-mapped arrays, can be reduced without building the
+    centered data or its left singular vectors.
+    """
+
+    def __init__(self, ndim, batch_size=1024):
+        """
+        Class constructor.
+
+        Args:
+            ndim (int): Number of principal components to keep.
+            batch_size (int): Number of rows read at once by fit.
+
+        Sets the public instance attributes:
+            ndim, batch_size: The settings above.
+            mean (numpy.ndarray): Mean of each feature, of shape (d,).
+            components (numpy.ndarray): Principal components, of shape
+                (ndim, d), None until fitted.
+            singular_values (numpy.ndarray): Singular values of the centered
+                data seen so far, of shape (ndim,).
+            n_samples (int): Number of rows seen so far.
+        """
+        if type(ndim) is not int or ndim <= 0:
+            raise TypeError("ndim must be a positive integer")
+        if type(batch_size) is not int or batch_size <= 0:
+            raise TypeError("batch_size must be a positive integer")
+        self.ndim = ndim
+        self.batch_size = batch_size
+        self.mean = None
+        self.components = None
+        self.singular_values = None
+        self.n_samples = 0
+
+    def partial_fit(self, X):
+        """
+        Updates the components with one batch of rows.
+
+        Args:
+            X (numpy.ndarray): Batch of shape (b, d).
+
+        The previous components scaled by their singular values, the
+        centered batch and a row correcting for the shift of the mean are
+        stacked into a (ndim + b + 1, d) matrix, whose SVD gives the
+        components of all rows seen so far (Ross et al.), so each batch
+        costs O((ndim + b)^2 * d).
+
+        Returns:
+            IncrementalPCA: self.
+        """
+        X = np.asarray(X, dtype=float)
+        if len(X.shape) != 2:
+            raise ValueError("X must be a 2D numpy.ndarray")
+        b = X.shape[0]
+        if b == 0:
+            return self
+        batch_mean = np.mean(X, axis=0)
+        if self.components is None:
+            stack = X - batch_mean
+            total = b
+            mean = batch_mean
+        else:
+            n = self.n_samples
+            total = n + b
+            mean = self.mean + (batch_mean - self.mean) * (b / total)
+            shift = np.sqrt(n * b / total) * (self.mean - batch_mean)
+            stack = np.vstack((self.singular_values[:, np.newaxis] *
+                               self.components, X - batch_mean, shift))
+        _, S, Vt = np.linalg.svd(stack, full_matrices=False)
+        self.mean = mean
+        self.components = Vt[:self.ndim]
+        self.singular_values = S[:self.ndim]
+        self.n_samples = total
+        return self
+
+    def fit(self, data):
+        """
+        Fits the components on a whole dataset, one batch at a time.
+
+        Args:
+            data (numpy.ndarray, numpy.memmap or str): The dataset of shape
+                (n, d), or the path of a .npy file, which is memory-mapped.
+
+        Returns:
+            IncrementalPCA: self.
+        """
+        if isinstance(data, str):
+            data = np.load(data, mmap_mode='r')
+        for start in range(0, data.shape[0], self.batch_size):
+            self.partial_fit(data[start:start + self.batch_size])
+        return self
+
+    def transform(self, X):
+        """
+        Projects data onto the principal components.
+
+        Args:
+            X (numpy.ndarray): Data of shape (n, d).
+
+        Returns:
+            numpy.ndarray: Transformed data of shape (n, ndim).
+        """
+        if self.components is None:
+            raise ValueError("the model must be fitted before transforming")
+        W = self.components.T
+        return np.dot(X, W) - np.dot(self.mean, W)
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import tempfile
+import numpy as np
+IncrementalPCA = __import__('2-incremental_pca').IncrementalPCA
+pca = __import__('1-pca').pca
+
+np.random.seed(0)
+a = np.random.normal(size=(10000, 3))
+X = np.dot(a, np.random.normal(size=(3, 50))) + 0.01 * np.random.normal(
+    size=(10000, 50))
+folder = tempfile.mkdtemp()
+path = os.path.join(folder, 'X.npy')
+np.save(path, X)
+
+model = IncrementalPCA(3, batch_size=1000).fit(path)
+shutil.rmtree(folder)
+print(model.n_samples, model.components.shape)
+T = model.transform(X)
+T_full = pca(X, 3)
+print(np.allclose(np.abs(T), np.abs(T_full)))
+T_rand = pca(X, 3, method='randomized')
+print(np.allclose(np.abs(T_rand), np.abs(T_full)))
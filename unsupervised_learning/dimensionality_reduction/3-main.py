@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import tempfile
+import numpy as np
+PCA = __import__('3-pca_model').PCA
+
+np.random.seed(0)
+a = np.random.normal(size=50)
+b = np.random.normal(size=50)
+c = np.random.normal(size=50)
+d = 2 * a
+e = -5 * b
+f = 10 * c
+
+X = np.array([a, b, c, d, e, f]).T
+model = PCA(var=0.95, block_size=16, workers=2).fit(X)
+print(model.ndim, model.ratios)
+folder = tempfile.mkdtemp()
+model.save(os.path.join(folder, 'pca.npz'))
+model = PCA.load(os.path.join(folder, 'pca.npz'))
+shutil.rmtree(folder)
+T = model.transform(X)
+print(T[:3])
+X_t = model.inverse_transform(T)
+print(np.sum(np.square(X - X_t)) / X.shape[0])
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Defines a class that stores a fitted PCA, so new data can be transformed
+without refitting.
+"""
+
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+n_components = __import__('0-pca').n_components
+randomized_svd = __import__('1-pca').randomized_svd
+
+
+class PCA():
+    """
+    Fitted PCA with its mean, components and explained variance, which can
+    be saved, loaded and applied to large batches of new data.
+    """
+
+    def __init__(self, ndim=None, var=0.95, method='full', block_size=65536,
+                 workers=1):
+        """
+        Class constructor.
+
+        Args:
+            ndim (int): Number of components to keep, or None to keep as
+                many as needed to retain var, as 0-pca does.
+            var (float): Fraction of variance to retain when ndim is None.
+            method (str): 'full' or 'randomized', see 1-pca. The randomized
+                SVD needs ndim.
+            block_size (int): Number of rows transformed at once by each
+                worker.
+            workers (int): Number of threads large batches are split
+                across, as in clustering/16-kmeans_model.
+
+        Sets the public instance attributes:
+            ndim, var, method, block_size, workers: The settings above,
+                ndim is set by fit when it is None.
+            mean (numpy.ndarray): Mean of each feature, of shape (d,).
+            components (numpy.ndarray): Principal components, of shape
+                (ndim, d), None until fitted.
+            explained_variance (numpy.ndarray): Variance of the data along
+                each component, of shape (ndim,).
+            ratios (numpy.ndarray): Variance ratio of each component, as
+                computed by 0-pca, of shape (ndim,). The randomized method
+                only knows the kept singular values, so its ratios are
+                relative to them.
+        """
+        if ndim is not None and (type(ndim) is not int or ndim <= 0):
+            raise TypeError("ndim must be a positive integer or None")
+        if method not in ('full', 'randomized'):
+            raise ValueError("method must be 'full' or 'randomized'")
+        if method == 'randomized' and ndim is None:
+            raise ValueError("the randomized method needs ndim")
+        if type(block_size) is not int or block_size <= 0:
+            raise TypeError("block_size must be a positive integer")
+        if type(workers) is not int or workers <= 0:
+            raise TypeError("workers must be a positive integer")
+        self.ndim = ndim
+        self.var = var
+        self.method = method
+        self.block_size = block_size
+        self.workers = workers
+        self.mean = None
+        self.components = None
+        self.explained_variance = None
+        self.ratios = None
+
+    def fit(self, X):
+        """
+        Fits the components on a dataset.
+
+        Args:
+            X (numpy.ndarray): Dataset of shape (n, d).
+
+        Returns:
+            PCA: self.
+        """
+        if not isinstance(X, np.ndarray) or len(X.shape) != 2:
+            raise TypeError("X must be a numpy.ndarray of shape (n, d)")
+        n = X.shape[0]
+        self.mean = np.mean(X, axis=0)
+        if self.method == 'randomized':
+            S, Vt = randomized_svd(X, self.mean, self.ndim)
+            ratios = S / np.sum(S)
+        else:
+            _, S, Vt = np.linalg.svd(X - self.mean, full_matrices=False)
+            nd, ratios = n_components(S, self.var)
+            if self.ndim is None:
+                self.ndim = int(nd)
+        self.components = Vt[:self.ndim]
+        self.explained_variance = S[:self.ndim] ** 2 / max(n - 1, 1)
+        self.ratios = ratios[:self.ndim]
+        return self
+
+    def blocks(self, X, out, function):
+        """
+        Applies a function to each row block of X, in parallel threads,
+        like KMeansModel.blocks in clustering/16-kmeans_model.
+
+        Args:
+            X (numpy.ndarray): Input of shape (n, m).
+            out (numpy.ndarray): Output of shape (n, p), filled in place.
+            function (callable): Called with an input block and the matching
+                output block.
+
+        Returns:
+            numpy.ndarray: out.
+        """
+        if not isinstance(X, np.ndarray) or len(X.shape) != 2:
+            raise TypeError("X must be a 2D numpy.ndarray")
+        n = X.shape[0]
+        starts = range(0, n, self.block_size)
+
+        def run(start):
+            """Transforms one row block in place."""
+            stop = start + self.block_size
+            function(X[start:stop], out[start:stop])
+
+        if self.workers == 1 or len(starts) <= 1:
+            for start in starts:
+                run(start)
+        else:
+            with ThreadPoolExecutor(self.workers) as pool:
+                list(pool.map(run, starts))
+        return out
+
+    def transform(self, X):
+        """
+        Projects data onto the principal components.
+
+        Args:
+            X (numpy.ndarray): Data of shape (n, d).
+
+        Returns:
+            numpy.ndarray: Transformed data of shape (n, ndim).
+        """
+        if self.components is None:
+            raise ValueError("the model must be fitted before transforming")
+        if X.shape[-1] != self.components.shape[1]:
+            raise ValueError("X must have as many features as the fitted "
+                             "data")
+
+        def project(block, out):
+            """Projects one row block."""
+            np.dot(block - self.mean, self.components.T, out=out)
+
+        return self.blocks(X, np.empty((X.shape[0], self.ndim)), project)
+
+    def inverse_transform(self, T):
+        """
+        Maps transformed data back to the original space.
+
+        Args:
+            T (numpy.ndarray): Transformed data of shape (n, ndim).
+
+        Returns:
+            numpy.ndarray: Reconstructed data of shape (n, d).
+        """
+        if self.components is None:
+            raise ValueError("the model must be fitted before transforming")
+        if T.shape[-1] != self.ndim:
+            raise ValueError("T must have ndim columns")
+
+        def reconstruct(block, out):
+            """Reconstructs one row block."""
+            np.dot(block, self.components, out=out)
+            out += self.mean
+
+        return self.blocks(T, np.empty((T.shape[0], self.mean.shape[0])),
+                           reconstruct)
+
+    def save(self, filename):
+        """
+        Saves the fitted model to a .npz file.
+
+        Args:
+            filename (str): The file to save to, '.npz' is added if missing.
+        """
+        if self.components is None:
+            raise ValueError("the model must be fitted before saving")
+        if not filename.endswith('.npz'):
+            filename += '.npz'
+        np.savez(filename, mean=self.mean, components=self.components,
+                 explained_variance=self.explained_variance,
+                 ratios=self.ratios)
+
+    @staticmethod
+    def load(filename, block_size=65536, workers=1):
+        """
+        Loads a model saved with save.
+
+        Args:
+            filename (str): The file to load from.
+            block_size (int): Number of rows transformed at once.
+            workers (int): Number of transform threads.
+
+        Returns:
+            PCA: The loaded model, or None if filename doesn't exist.
+        """
+        if not os.path.isfile(filename):
+            return None
+        with np.load(filename) as saved:
+            model = PCA(saved['components'].shape[0],
+                        block_size=block_size, workers=workers)
+            model.mean = saved['mean']
+            model.components = saved['components']
+            model.explained_variance = saved['explained_variance']
+            model.ratios = saved['ratios']
+        return model
@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+
+import numpy as np
+tsne = __import__('4-tsne').tsne
+
+np.random.seed(0)
+centers = np.random.normal(scale=10, size=(5, 100))
+labels = np.repeat(np.arange(5), 200)
+X = centers[labels] + np.random.normal(size=(1000, 100))
+
+Y, info = tsne(X, iterations=300, verbose=True, return_info=True)
+print(Y.shape)
+print("affinities: {:.2f}s".format(info['affinities']))
+print("iteration: {:.3f}s, repulsion: {:.3f}s".format(
+    np.mean(info['iterations']), np.mean(info['repulsion'])))
+for i in range(5):
+    print(i, np.round(np.mean(Y[labels == i], axis=0), 2))
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Defines the functions that perform a t-SNE transformation with sparse
+nearest neighbor affinities and a Barnes-Hut approximation of the
+repulsive forces.
+"""
+
+import time
+import numpy as np
+pca = __import__('1-pca').pca
+
+
+def knn(X, k, max_memory=2 ** 27):
+    """
+    Finds the exact k nearest neighbors of every point.
+
+    Args:
+        X (numpy.ndarray): Dataset of shape (n, d).
+        k (int): Number of neighbors, smaller than n.
+        max_memory (int): Approximate number of bytes of the distance block
+            computed at once, so the (n, n) distance matrix is never built.
+
+    Returns:
+        tuple: (indices, D) two numpy.ndarrays of shape (n, k) holding the
+            neighbors of each point, nearest first, and their squared
+            distances.
+    """
+    n = X.shape[0]
+    sq = np.sum(np.square(X), axis=1)
+    indices = np.empty((n, k), dtype=np.int64)
+    D = np.empty((n, k))
+    step = max(1, int(max_memory // (8 * n)))
+    for start in range(0, n, step):
+        stop = min(start + step, n)
+        block = sq[start:stop, np.newaxis] - 2 * np.dot(X[start:stop], X.T)
+        block += sq
+        # a point is not its own neighbor, even when it has duplicates
+        block[np.arange(stop - start), np.arange(start, stop)] = np.inf
+        near = np.argpartition(block, k - 1, axis=1)[:, :k]
+        dist = np.take_along_axis(block, near, axis=1)
+        order = np.argsort(dist, axis=1)
+        indices[start:stop] = np.take_along_axis(near, order, axis=1)
+        D[start:stop] = np.maximum(np.take_along_axis(dist, order, axis=1),
+                                   0)
+    return indices, D
+
+
+def binary_search(D, perplexity, tol=1e-5, iterations=50):
+    """
+    Finds the precision of the Gaussian kernel of every point that gives
+    its conditional distribution the requested perplexity.
+
+    Args:
+        D (numpy.ndarray): Squared distances to the neighbors of each
+            point, of shape (n, k).
+        perplexity (float): Target perplexity of every distribution.
+        tol (float): Tolerance on the Shannon entropy, in nats.
+        iterations (int): Maximum number of bisection steps.
+
+    All the rows are bisected at once, so each step is a few vectorized
+    operations on the (n, k) array instead of a Python loop over points.
+
+    Returns:
+        tuple: (P, betas) the conditional probabilities p(j|i) of shape
+            (n, k), each row summing to 1, and the precisions of shape (n,).
+    """
+    n = D.shape[0]
+    H_target = np.log(perplexity)
+    # the entropy does not change when a row is shifted, so the nearest
+    # distance is removed to keep the exponentials from underflowing
+    D = D - np.min(D, axis=1, keepdims=True)
+    betas = np.ones(n)
+    low = np.zeros(n)
+    high = np.full(n, np.inf)
+    for _ in range(iterations):
+        P = np.exp(-D * betas[:, np.newaxis])
+        sum_P = np.sum(P, axis=1)
+        H = np.log(sum_P) + betas * np.sum(D * P, axis=1) / sum_P
+        diff = H - H_target
+        done = np.abs(diff) < tol
+        if np.all(done):
+            break
+        # a too high entropy needs a narrower kernel, so a larger beta
+        up = diff > 0
+        low = np.where(up, betas, low)
+        high = np.where(up, high, betas)
+        new = np.where(np.isinf(high), betas * 2, (low + high) / 2)
+        betas = np.where(done, betas, new)
+    P = np.exp(-D * betas[:, np.newaxis])
+    return P / np.sum(P, axis=1, keepdims=True), betas
+
+
+def affinities(X, perplexity=30.0, tol=1e-5, max_memory=2 ** 27):
+    """
+    Calculates the symmetric P affinities of t-SNE over the nearest
+    neighbors of each point.
+
+    Args:
+        X (numpy.ndarray): Dataset of shape (n, d).
+        perplexity (float): Perplexity of the conditional distributions.
+        tol (float): Tolerance on their entropy, see binary_search.
+        max_memory (int): See knn.
+
+    Only the 3 * perplexity nearest neighbors of each point get a non-zero
+    affinity, so P has O(n * perplexity) entries instead of n^2.
+
+    Returns:
+        tuple: (rows, cols, P) a sparse matrix in coordinate format, sorted
+            by row, whose entries p_ij == (p(j|i) + p(i|j)) / 2n sum to 1.
+    """
+    n = X.shape[0]
+    k = min(n - 1, int(3 * perplexity))
+    indices, D = knn(X, k, max_memory)
+    P, _ = binary_search(D, perplexity, tol)
+    rows = np.repeat(np.arange(n), k)
+    cols = indices.ravel()
+    # P + P^T, adding up the pairs that are neighbors both ways
+    keys = np.concatenate((rows * n + cols, cols * n + rows))
+    keys, inverse = np.unique(keys, return_inverse=True)
+    P = np.bincount(inverse.ravel(), np.tile(P.ravel(), 2)) / (2 * n)
+    return keys // n, keys % n, P
+
+
+def attraction(Y, rows, cols, P):
+    """
+    Calculates the attractive forces of t-SNE.
+
+    Args:
+        Y (numpy.ndarray): Embedding of shape (n, ndims).
+        rows, cols, P: The sparse affinities, see affinities.
+
+    Returns:
+        tuple: (F, W) the forces sum_j p_ij w_ij (y_i - y_j) of shape
+            (n, ndims), and the kernel w_ij == 1 / (1 + |y_i - y_j|^2) of
+            each entry of P.
+    """
+    diff = Y[rows] - Y[cols]
+    W = 1 / (1 + np.sum(np.square(diff), axis=1))
+    PW = P * W
+    F = np.empty(Y.shape)
+    for j in range(Y.shape[1]):
+        F[:, j] = np.bincount(rows, PW * diff[:, j], minlength=Y.shape[0])
+    return F, W
+
+
+def quadtree(Y, depth=16):
+    """
+    Builds a quadtree over a 2D embedding, one level at a time.
+
+    Args:
+        Y (numpy.ndarray): Embedding of shape (n, 2).
+        depth (int): Maximum depth of the tree, at most 31.
+
+    Each point gets the Morton code of its cell at the deepest level, so
+    the cells of any level are the distinct prefixes of the sorted codes,
+    and their sizes and centers of mass are segment reductions.
+
+    Returns:
+        tuple: (levels, codes, width)
+            levels (list): One dictionary per level, down to the first
+                level where every cell holds a single point, with the
+                sorted 'keys' of its cells, their 'counts', the
+                coordinates 'x' and 'y' of their centers of mass and their
+                'leaf' flags, and for inner levels the range of
+                the children of each cell in the next level, 'first' and
+                'last'.
+            codes (numpy.ndarray): Morton code of each point, of shape (n,).
+            width (float): Side of the root cell.
+    """
+    n = Y.shape[0]
+    low = np.min(Y, axis=0)
+    width = np.max(np.max(Y, axis=0) - low)
+    width = width * (1 + 1e-9) if width > 0 else 1.0
+    side = 2 ** depth
+    cells = np.minimum((Y - low) / width * side, side - 1).astype(np.int64)
+    codes = np.zeros(n, dtype=np.int64)
+    for bit in range(depth):
+        codes |= ((cells[:, 0] >> bit) & 1) << (2 * bit)
+        codes |= ((cells[:, 1] >> bit) & 1) << (2 * bit + 1)
+    order = np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+    Y_sorted = Y[order]
+    levels = []
+    for level in range(depth + 1):
+        prefixes = sorted_codes >> (2 * (depth - level))
+        starts = np.flatnonzero(np.concatenate(
+            ([True], prefixes[1:] != prefixes[:-1])))
+        counts = np.diff(np.append(starts, n))
+        com = np.add.reduceat(Y_sorted, starts, axis=0) / counts[:, None]
+        levels.append({'keys': prefixes[starts], 'counts': counts,
+                       'x': com[:, 0].copy(), 'y': com[:, 1].copy(),
+                       'leaf': counts == 1})
+        if np.all(counts == 1):
+            break
+    levels[-1]['leaf'][:] = True
+    for parent, child in zip(levels[:-1], levels[1:]):
+        up = child['keys'] >> 2
+        parent['first'] = np.searchsorted(up, parent['keys'], 'left')
+        parent['last'] = np.searchsorted(up, parent['keys'], 'right')
+    return levels, codes, width
+
+
+def bh_repulsion(Y, theta=0.5, depth=16, max_memory=2 ** 27):
+    """
+    Approximates the repulsive forces of t-SNE with a Barnes-Hut quadtree.
+
+    Args:
+        Y (numpy.ndarray): Embedding of shape (n, 2).
+        theta (float): Accuracy of the approximation, a cell of side s at
+            distance r from a point is summarized by its center of mass
+            when s / r < theta, 0 gives the exact forces.
+        depth (int): Maximum depth of the quadtree, see quadtree.
+        max_memory (int): Approximate number of bytes of the point-cell
+            pairs traversed at once.
+
+    The tree is walked by all the points of a chunk together, one level at
+    a time: the pairs whose cell is far enough or a leaf are summed, and
+    the others are replaced by the pairs of the children of the cell, so
+    each point visits O(log n) cells instead of n points.
+
+    Returns:
+        tuple: (F, Z) the unnormalized forces sum_j w_ij^2 (y_i - y_j) of
+            shape (n, 2), and the normalization Z == sum_{i != j} w_ij.
+    """
+    n = Y.shape[0]
+    levels, codes, width = quadtree(Y, depth)
+    x = np.ascontiguousarray(Y[:, 0])
+    y = np.ascontiguousarray(Y[:, 1])
+    F = np.zeros((n, 2))
+    Z = 0.0
+    # chunks of points close to each other visit the same cells
+    order = np.argsort(codes, kind='stable')
+    step = max(1, int(max_memory // (8 * 8 * 64)))
+    for start in range(0, n, step):
+        points = order[start:start + step]
+        cells = np.zeros(points.size, dtype=np.int64)
+        for level, tree in enumerate(levels):
+            size = width / 2 ** level
+            # a cell is far enough when its side is below theta times its
+            # distance, so when that distance squared exceeds the limit
+            limit = size * size / (theta * theta) if theta > 0 else np.inf
+            dx = x[points] - tree['x'][cells]
+            dy = y[points] - tree['y'][cells]
+            d2 = dx * dx + dy * dy
+            leaf = tree['leaf'][cells]
+            accept = np.flatnonzero(leaf | (d2 > limit))
+            p = points[accept]
+            w = 1 / (1 + d2[accept])
+            cw = tree['counts'][cells[accept]] * w
+            Z += np.sum(cw)
+            cw *= w
+            F[:, 0] += np.bincount(p, cw * dx[accept], minlength=n)
+            F[:, 1] += np.bincount(p, cw * dy[accept], minlength=n)
+            # a point in its own leaf added w_ii == 1 to Z
+            own = np.flatnonzero(leaf)
+            Z -= np.count_nonzero(codes[points[own]] >> (2 * (depth - level))
+                                  == tree['keys'][cells[own]])
+            rest = np.flatnonzero(~leaf & (d2 <= limit))
+            if rest.size == 0:
+                break
+            first = tree['first'][cells[rest]]
+            number = tree['last'][cells[rest]] - first
+            points = np.repeat(points[rest], number)
+            offsets = np.arange(points.size) - np.repeat(
+                np.cumsum(number) - number, number)
+            cells = np.repeat(first, number) + offsets
+    return F, Z
+
+
+def exact_repulsion(Y):
+    """
+    Calculates the exact repulsive forces of t-SNE.
+
+    Args:
+        Y (numpy.ndarray): Embedding of shape (n, ndims).
+
+    Returns:
+        tuple: (F, Z) see bh_repulsion, in O(n^2) time and memory.
+    """
+    sq = np.sum(np.square(Y), axis=1)
+    W = 1 / (1 + np.maximum(sq[:, None] - 2 * np.dot(Y, Y.T) + sq, 0))
+    np.fill_diagonal(W, 0)
+    W2 = np.square(W)
+    F = Y * np.sum(W2, axis=1, keepdims=True) - np.dot(W2, Y)
+    return F, np.sum(W)
+
+
+def tsne(X, ndims=2, idims=50, perplexity=30.0, iterations=1000, lr=None,
+         method='barnes_hut', theta=0.5, early_exaggeration=12.0,
+         exaggeration_iterations=250, pca_method='full', verbose=False,
+         return_info=False, max_memory=2 ** 27):
+    """
+    Performs a t-SNE transformation.
+
+    Args:
+        X (numpy.ndarray): Dataset of shape (n, d).
+        ndims (int): Dimensionality of the embedding, 2 for Barnes-Hut.
+        idims (int): Dimensionality kept by PCA before the affinities are
+            computed, see 1-pca.
+        perplexity (float): Perplexity of the affinities.
+        iterations (int): Number of gradient descent iterations.
+        lr (float): Learning rate, None for max(n / early_exaggeration / 4,
+            50), which large datasets need to converge.
+        method (str): 'barnes_hut' for O(n log n) iterations, or 'exact'
+            for O(n^2) ones in any dimensionality.
+        theta (float): Accuracy of the Barnes-Hut approximation.
+        early_exaggeration (float): Factor of P during the first iterations.
+        exaggeration_iterations (int): Number of exaggerated iterations,
+            which also use a momentum of 0.5 instead of 0.8.
+        pca_method (str): 'full' or 'randomized', see 1-pca.
+        verbose (bool): Prints the cost every 100 iterations.
+        return_info (bool): Also returns the timings and costs.
+        max_memory (int): Approximate number of bytes of the temporary
+            arrays, see knn and bh_repulsion.
+
+    Seed numpy.random for reproducible results.
+
+    Returns:
+        numpy.ndarray: The embedding of shape (n, ndims), and with
+            return_info a dictionary holding the seconds spent in 'pca',
+            'affinities' and 'iterations', a numpy.ndarray of shape
+            (iterations,), with the part of each iteration spent on the
+            repulsive forces in 'repulsion', and the (iteration, cost)
+            pairs computed every 100 iterations in 'cost'.
+    """
+    if method not in ('barnes_hut', 'exact'):
+        raise ValueError("method must be 'barnes_hut' or 'exact'")
+    if method == 'barnes_hut' and ndims != 2:
+        raise ValueError("the Barnes-Hut method needs ndims == 2")
+    n = X.shape[0]
+    if lr is None:
+        lr = max(n / early_exaggeration / 4, 50)
+    info = {'iterations': np.zeros(iterations),
+            'repulsion': np.zeros(iterations), 'cost': []}
+
+    start = time.perf_counter()
+    if X.shape[1] > idims:
+        X = pca(X, idims, pca_method)
+    info['pca'] = time.perf_counter() - start
+    start = time.perf_counter()
+    rows, cols, P = affinities(X, perplexity, max_memory=max_memory)
+    info['affinities'] = time.perf_counter() - start
+
+    Y = np.random.normal(scale=1e-4, size=(n, ndims))
+    iY = np.zeros((n, ndims))
+    gains = np.ones((n, ndims))
+    for i in range(iterations):
+        start = time.perf_counter()
+        early = i < exaggeration_iterations
+        exaggeration = early_exaggeration if early else 1
+        momentum = 0.5 if early else 0.8
+        attractive, W = attraction(Y, rows, cols, P)
+        split = time.perf_counter()
+        if method == 'barnes_hut':
+            repulsive, Z = bh_repulsion(Y, theta, max_memory=max_memory)
+        else:
+            repulsive, Z = exact_repulsion(Y)
+        info['repulsion'][i] = time.perf_counter() - split
+        grad = 4 * (exaggeration * attractive - repulsive / Z)
+
+        same = (grad > 0) == (iY > 0)
+        gains = np.where(same, gains * 0.8, gains + 0.2)
+        gains = np.maximum(gains, 0.01)
+        iY = momentum * iY - lr * gains * grad
+        Y = Y + iY
+        Y = Y - np.mean(Y, axis=0)
+        info['iterations'][i] = time.perf_counter() - start
+
+        if (i + 1) % 100 == 0:
+            # only the non-zero p_ij contribute to KL(P || Q)
+            C = np.sum(P * np.log(np.maximum(P * Z / W, 1e-300)))
+            info['cost'].append((i + 1, C))
+            if verbose:
+                print("Cost at iteration {}: {}".format(i + 1, C))
+    if return_info:
+        return Y, info
+    return Y
@@ -7,14 +7,25 @@ being in a particular state after a specified number of iterations
 
 
 import numpy as np
+from scipy import sparse
 
 
 def markov_chain(P, s, t=1):
     '''
         Determines the probability of a markov chain
+
+        P is a square numpy.ndarray or scipy.sparse matrix of shape (n, n)
+        s is a numpy.ndarray of shape (m, n), one starting distribution
+            per row, so many of them are propagated at once
+        t is the number of iterations
+
+        dense chains are raised to the power t by repeated squaring when
+        that takes fewer operations than t products with s, sparse chains
+        are stepped t times since their powers fill in
     '''
     # check that P is the correct type and dimensions
-    if type(P) is not np.ndarray or len(P.shape) != 2:
+    if not (type(P) is np.ndarray or sparse.issparse(P)) or \
+            len(P.shape) != 2:
         return None
     # save value of n and check that P is square
     n, n_check = P.shape
@@ -23,13 +34,23 @@ def markov_chain(P, s, t=1):
     # check that s is the correct type and dimensions
     if type(s) is not np.ndarray or len(s.shape) != 2:
         return None
-    # check that the shape of s matches (1, n)
-    one, n_check = s.shape
-    if one != 1 or n_check != n:
+    # check that the shape of s matches (m, n)
+    m, n_check = s.shape
+    if m < 1 or n_check != n:
         return None
     # check that t is the correct type and is non-negative
     if type(t) is not int or t < 0:
         return None
+    if sparse.issparse(P):
+        P = P.tocsr()
+        result = s
+        for i in range(t):
+            # (P^T s^T)^T keeps the product sparse-times-dense
+            result = np.asarray(P.T.dot(result.T)).T
+        return result
+    # squaring costs up to 2 * n^3 per bit of t, stepping m * n^2 per step
+    if t * m > 2 * n * t.bit_length():
+        return np.matmul(s, np.linalg.matrix_power(P, t))
     result = s
     for i in range(t):
         result = np.matmul(result, P)
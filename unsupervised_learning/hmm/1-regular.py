@@ -7,27 +7,107 @@
 
 
 import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
+from scipy.sparse import linalg
 
 
-def regular(P):
+def is_regular(P):
+    '''
+        Determines if a markov chain is regular, meaning some power of P
+        has only positive entries
+
+        P is a square numpy.ndarray or scipy.sparse matrix of shape (n, n)
+
+        a chain is regular when its transition graph is strongly connected
+        and aperiodic; the period is the gcd of level[i] + 1 - level[j]
+        over all transitions i -> j, where level is the breadth-first
+        distance from state 0, so the check costs O(nnz) instead of
+        raising P to powers
+    '''
+    graph = sparse.csr_matrix(P)
+    graph.eliminate_zeros()
+    count, labels = csgraph.connected_components(graph, directed=True,
+                                                 connection='strong')
+    if count != 1:
+        return False
+    level = csgraph.shortest_path(graph, unweighted=True, indices=0)
+    rows, cols = graph.nonzero()
+    gaps = (level[rows] + 1 - level[cols]).astype(int)
+    return np.gcd.reduce(np.abs(gaps)) == 1
+
+
+def regular(P, method=None, tol=1e-12, iterations=10000):
     '''
         Determines the steady state probabilities of a regular
         markov chain
+
+        P is a square numpy.ndarray or scipy.sparse matrix of shape (n, n)
+        method is how the steady state is found, None for 'solve' with a
+            numpy.ndarray and 'krylov' with a sparse matrix:
+            'solve': solves pi (P - I) = 0 with sum(pi) = 1 directly, with
+                a sparse LU factorization for sparse P, only for banded and
+                left-to-right chains whose factors stay sparse; random
+                jumps fill the factors in, 10k such states take ~30 s
+            'krylov': solves the same system with GMRES preconditioned by
+                its diagonal, which only needs sparse products, ~1 s for
+                50k states whatever the structure of the chain
+            'power': repeats pi = pi P from the uniform distribution, fast
+                for chains with random jumps that mix quickly, but it
+                stalls on slowly mixing chains
+        tol is the L1 change below which power iteration stops, or the
+            relative residual below which GMRES stops
+        iterations is the maximum number of power iteration steps or GMRES
+            restarts, None is returned if tol is not met after them
+
+        Returns: a numpy.ndarray of shape (1, n) containing the steady
+        state probabilities, or None on failure
     '''
     # check that P is the correct type and dimensions
-    if type(P) is not np.ndarray or len(P.shape) != 2:
+    if not (type(P) is np.ndarray or sparse.issparse(P)) or \
+            len(P.shape) != 2:
         return None
     # save value of n and check that P is square
     n, n_check = P.shape
     if n != n_check:
         return None
-    if not (P > 0).all():
+    if method is None:
+        method = 'krylov' if sparse.issparse(P) else 'solve'
+    if method not in ('solve', 'krylov', 'power'):
+        return None
+    if not is_regular(P):
+        return None
+    if method == 'power':
+        P_T = sparse.csr_matrix(P.T) if sparse.issparse(P) else P.T
+        result = np.full(n, 1 / n)
+        for i in range(iterations):
+            step = P_T.dot(result)
+            if np.sum(np.abs(step - result)) < tol:
+                return np.expand_dims(step / np.sum(step), axis=0)
+            result = step
+        # the chain mixes too slowly for the iteration budget
         return None
-    Identity = np.identity(n)
-    Q = P - Identity
-    e = np.ones((n,))
-    Qe = np.c_[Q, e]
-    QTQ = np.matmul(Qe, Qe.T)
-    QbT = np.ones((n,))
-    result = np.linalg.solve(QTQ, QbT)
-    return np.expand_dims(result, axis=0)
+    if n == 1:
+        return np.ones((1, 1))
+    # the rows of (P - I)^T add up to zero, so the last equation is
+    # dropped and the last probability pinned to 1 before normalizing,
+    # which keeps the system as sparse as P
+    if sparse.issparse(P):
+        Q = sparse.csc_matrix(P.T - sparse.identity(n))
+        A = Q[:n - 1, :n - 1]
+        b = -Q[:n - 1, n - 1].toarray()[:, 0]
+        if method == 'solve':
+            result = linalg.spsolve(A, b)
+        else:
+            # a regular chain has no p_ii == 1, so the diagonal is never 0
+            M = sparse.diags(1 / A.diagonal())
+            result, info = linalg.gmres(A, b, M=M, rtol=tol, atol=0,
+                                        restart=50, maxiter=iterations)
+            if info != 0:
+                return None
+        result = np.append(result, 1)
+    else:
+        Q = P.T - np.identity(n)
+        result = np.append(np.linalg.solve(Q[:n - 1, :n - 1],
+                                           -Q[:n - 1, n - 1]), 1)
+    return np.expand_dims(result / np.sum(result), axis=0)
@@ -6,28 +6,141 @@
 
 
 import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
+from scipy.sparse import linalg
+
+
+def absorbing_states(P):
+    '''
+        Finds the absorbing states of a markov chain, the states i with
+        P[i, i] == 1
+
+        P is a square numpy.ndarray or scipy.sparse matrix of shape (n, n)
+
+        Returns: a numpy.ndarray containing the indices of the absorbing
+        states, in increasing order
+    '''
+    if sparse.issparse(P):
+        D = P.diagonal()
+    else:
+        D = np.diagonal(P)
+    return np.nonzero(D == 1)[0]
 
 
 def absorbing(P):
     '''
         Determines if a markov chain is absorbing
+
+        P is a square numpy.ndarray or scipy.sparse matrix of shape (n, n)
+
+        a chain is absorbing when it has an absorbing state and every state
+        can reach one; a single breadth-first search on the reversed
+        transition graph, started from all absorbing states at once,
+        finds the states that can, in O(n + nnz)
+
+        Returns: True if it is absorbing, False if not, or None on failure
     '''
-    if len(P.shape) != 2:
+    if not (type(P) is np.ndarray or sparse.issparse(P)) or \
+            len(P.shape) != 2:
         return None
     n1, n2 = P.shape
-    if (n1 != n2) or type(P) is not np.ndarray:
+    if n1 != n2:
         return None
-    D = np.diagonal(P)
-    if (D == 1).all():
-        return True
-    if not (D == 1).any():
+    ends = absorbing_states(P)
+    if ends.size == 0:
         return False
+    if ends.size == n1:
+        return True
+    # the reversed graph plus a source node n1 pointing to every
+    # absorbing state
+    graph = sparse.coo_matrix(P)
+    keep = graph.data != 0
+    rows = np.concatenate((graph.col[keep], np.full(ends.size, n1)))
+    cols = np.concatenate((graph.row[keep], ends))
+    reverse = sparse.csr_matrix((np.ones(rows.size), (rows, cols)),
+                                shape=(n1 + 1, n1 + 1))
+    reached = csgraph.breadth_first_order(reverse, n1, directed=True,
+                                          return_predecessors=False)
+    return reached.size == n1 + 1
+
+
+def absorption(P, fundamental=False, method=None, tol=1e-10,
+               iterations=1000):
+    '''
+        Analyzes an absorbing markov chain
+
+        P is a square numpy.ndarray or scipy.sparse matrix of shape (n, n)
+        fundamental is True to also return the fundamental matrix, which
+            is dense, so only for chains with a moderate number of
+            transient states; it is always computed with 'solve'
+        method is how the linear systems in (I - Q) are solved, None for
+            'solve' with a numpy.ndarray and 'krylov' with a sparse matrix:
+            'solve': (I - Q) is factorized once with a sparse LU
+                decomposition and every system is a solve against it, only
+                for banded and left-to-right chains whose factors stay
+                sparse; random jumps fill the factors in, 20k such states
+                take minutes
+            'krylov': every system is solved with GMRES preconditioned by
+                the diagonal of (I - Q), which only needs sparse products,
+                so chains of 100k+ states take seconds whatever their
+                structure
+        tol is the relative residual below which GMRES stops
+        iterations is the maximum number of GMRES restarts, None is
+            returned for each value if tol is not met after them
 
-    for i in range(n1):
-            # print('this is Pi {}'.format(P[i]))
-            for j in range(n2):
-                # print('this is Pj {}'.format(P[j]))
-                if (i == j) and (i + 1 < len(P)):
-                    if P[i + 1][j] == 0 and P[i][j + 1] == 0:
-                        return False
-    return True
+        with the transient states first, P == [[Q, R], [0, I]]; the
+        fundamental matrix is N == (I - Q)^-1, the expected number of steps
+        before absorption is N 1 and the absorption probabilities are N R,
+        so N is never formed unless asked for
+
+        Returns: transient, ends, steps, B (, N)
+            transient is a numpy.ndarray of shape (t,) containing the
+                indices of the transient states
+            ends is a numpy.ndarray of shape (a,) containing the indices
+                of the absorbing states
+            steps is a numpy.ndarray of shape (t,) containing the expected
+                number of steps from each transient state to absorption
+            B is a numpy.ndarray of shape (t, a) containing the probability
+                of each transient state to end in each absorbing state
+            N is a numpy.ndarray of shape (t, t) containing the expected
+                number of visits of each transient state from each other
+        or None for each of them if the chain is not absorbing
+    '''
+    failure = (None,) * (5 if fundamental else 4)
+    if method is None:
+        method = 'krylov' if sparse.issparse(P) else 'solve'
+    if method not in ('solve', 'krylov'):
+        return failure
+    if not absorbing(P):
+        return failure
+    n = P.shape[0]
+    ends = absorbing_states(P)
+    transient = np.setdiff1d(np.arange(n), ends)
+    P = sparse.csr_matrix(P, dtype=float)
+    Q = P[transient][:, transient]
+    R = P[transient][:, ends]
+    t = transient.size
+    if t == 0:
+        result = (transient, ends, np.zeros(0), np.zeros((0, ends.size)))
+        return result + (np.zeros((0, 0)),) if fundamental else result
+    A = sparse.csc_matrix(sparse.identity(t) - Q)
+    # the steps and one absorption column per absorbing state
+    targets = np.column_stack((np.ones(t), R.toarray()))
+    if method == 'solve' or fundamental:
+        lu = linalg.splu(A)
+        solved = lu.solve(targets)
+    else:
+        # transient states have q_ii < 1, so the diagonal is never 0
+        M = sparse.diags(1 / A.diagonal())
+        solved = np.empty(targets.shape)
+        for j in range(targets.shape[1]):
+            solved[:, j], info = linalg.gmres(A, targets[:, j], M=M,
+                                              rtol=tol, atol=0, restart=50,
+                                              maxiter=iterations)
+            if info != 0:
+                return failure
+    steps, B = solved[:, 0], solved[:, 1:]
+    if fundamental:
+        return transient, ends, steps, B, lu.solve(np.identity(t))
+    return transient, ends, steps, B
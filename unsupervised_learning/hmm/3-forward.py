@@ -8,36 +8,129 @@
 
 
 import numpy as np
+as_transition = __import__('7-transitions').as_transition
+forward_step = __import__('7-transitions').forward_step
 
 
-def forward(Observation, Emission, Transition, Initial):
+def scaled_forward(Observation, Emission, Transition, Initial):
+    '''
+    performs the forward recursion with a normalization at every step
+
+    Observation is a numpy.ndarray of shape (T,) with the observation indices
+    Emission is a numpy.ndarray of shape (N, M), Transition of shape (N, N)
+        prepared by 7-transitions.as_transition, and Initial of shape (N, 1)
+
+    each step is one vector-matrix product, and dividing alpha by its sum
+    keeps it in range however long the sequence is
+
+    Returns: F, c
+        F is a numpy.ndarray of shape (N, T) whose column t holds the
+            probability of each hidden state given the first t + 1
+            observations
+        c is a numpy.ndarray of shape (T,) containing the scaling factors,
+            P(O|λ) == prod(c), so log P(O|λ) == sum(log(c))
+    '''
+    T = Observation.shape[0]
+    N = Transition.shape[0]
+    # emission probabilities of the whole sequence, shape (T, N)
+    B = Emission[:, Observation].T
+    F = np.empty((T, N))
+    c = np.empty(T)
+    # initialization α1(j) = πjbj(o1) 1 ≤ j ≤ N
+    alpha = Initial[:, 0] * B[0]
+    for t in range(T):
+        if t:
+            # Recursion αt(j) == ∑Ni=1 αt−1(i)ai jbj(ot); 1≤j≤N,1<t≤T
+            alpha = forward_step(F[t - 1], Transition) * B[t]
+        c[t] = np.sum(alpha)
+        # an impossible prefix keeps alpha at zero instead of nan
+        F[t] = alpha / (c[t] if c[t] > 0 else 1)
+    return F.T, c
+
+
+def forward(Observation, Emission, Transition, Initial, log=False):
     '''
     performs the forward algorithm for a hidden markov model
+
+    Observation is a numpy.ndarray of shape (T,) with the observation indices
+    Emission is a numpy.ndarray of shape (N, M), Transition a numpy.ndarray
+        or scipy.sparse matrix of shape (N, N) and Initial of shape (N, 1)
+    log is True to get log P(O|λ) and the scaled forward probabilities,
+        which do not underflow on long sequences
+
+    Returns: P, F
+        P is the likelihood of the observations given the model, or its
+            log if log is True
+        F is a numpy.ndarray of shape (N, T) containing the forward path
+            probabilities, or if log is True the probability of each
+            hidden state given the observations so far
+        or None, None on failure
     '''
-    # check that Observation is the correct type and dimension
     try:
-        # Hidden States
-        N = Transition.shape[0]
-
-        # Observations
         T = Observation.shape[0]
+        N, M = Emission.shape
+        if len(Observation.shape) != 1 or T == 0:
+            return None, None
+        Transition = as_transition(Transition)
+        if Transition is None or Transition.shape != (N, N) or \
+                Initial.shape != (N, 1):
+            return None, None
+        F, c = scaled_forward(Observation, Emission, Transition, Initial)
+        with np.errstate(divide='ignore'):
+            log_c = np.log(c)
+        if log:
+            return np.sum(log_c), F
+        # undo the scaling, α == F * prod(c) up to each step
+        # Termination P(O|λ) == ∑Ni=1 αT (i)
+        return np.prod(c), F * np.exp(np.cumsum(log_c))
+    except Exception:
+        return None, None
 
-        # F == alpha
-        # initialization α1(j) = πjbj(o1) 1 ≤ j ≤ N
-        F = np.zeros((N, T))
-        F[:, 0] = Initial.T * Emission[:, Observation[0]]
 
-        # formula shorturl.at/amtJT
-        # Recursion αt(j) == ∑Ni=1 αt−1(i)ai jbj(ot); 1≤j≤N,1<t≤T
-        for t in range(1, T):
-            for n in range(N):
-                Transitions = Transition[:, n]
-                Emissions = Emission[n, Observation[t]]
-                F[n, t] = np.sum(Transitions * F[:, t - 1]
-                                 * Emissions)
+def forward_batch(Observations, Emission, Transition, Initial):
+    '''
+    performs the scaled forward algorithm on many sequences at once
 
-        # Termination P(O|λ) == ∑Ni=1 αT (i)
-        P = np.sum(F[:, -1])
-        return P, F
+    Observations is a list of numpy.ndarray of shape (T_i,), the sequences
+        can have different lengths
+    Emission is a numpy.ndarray of shape (N, M), Transition a numpy.ndarray
+        or scipy.sparse matrix of shape (N, N) and Initial of shape (N, 1)
+
+    the sequences are sorted by decreasing length, so at step t the ones
+    still running are a prefix of the batch and advance together with one
+    matrix-matrix product
+
+    Returns: a numpy.ndarray of shape (len(Observations),) containing
+        log P(O|λ) for each sequence, -inf for impossible ones,
+        or None on failure
+    '''
+    try:
+        lengths = np.array([len(seq) for seq in Observations])
+        if lengths.size == 0 or np.min(lengths) == 0:
+            return None
+        Transition = as_transition(Transition)
+        if Transition is None:
+            return None
+        order = np.argsort(-lengths, kind='stable')
+        lengths = lengths[order]
+        # observations padded to the longest sequence, shape (S, T)
+        padded = np.zeros((lengths.size, lengths[0]), dtype=int)
+        for i, j in enumerate(order):
+            padded[i, :lengths[i]] = Observations[j]
+        alpha = Initial[:, 0] * Emission[:, padded[:, 0]].T
+        log_P = np.zeros(lengths.size)
+        with np.errstate(divide='ignore'):
+            for t in range(lengths[0]):
+                running = np.searchsorted(-lengths, -t, side='left')
+                alpha = alpha[:running]
+                if t:
+                    alpha = (forward_step(alpha, Transition) *
+                             Emission[:, padded[:running, t]].T)
+                c = np.sum(alpha, axis=1)
+                log_P[:running] += np.log(c)
+                alpha /= np.where(c > 0, c, 1)[:, np.newaxis]
+        result = np.empty(lengths.size)
+        result[order] = log_P
+        return result
     except Exception:
-        None, None
+        return None
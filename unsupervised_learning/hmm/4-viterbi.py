@@ -9,55 +9,169 @@
 
 
 import numpy as np
+from scipy import sparse
+as_transition = __import__('7-transitions').as_transition
+log_incoming = __import__('7-transitions').log_incoming
+max_step = __import__('7-transitions').max_step
 
 
-def viterbi(Observation, Emission, Transition, Initial):
+def decode(padded, lengths, log_E, log_A, log_pi, beam=None):
     '''
-    calculates the most likely sequence of hidden states
-    for a hidden markov model
+    runs the log-space viterbi recursion on a batch of sequences
+
+    padded is a numpy.ndarray of shape (S, T) containing the observation
+        indices, padded to the longest sequence
+    lengths is a numpy.ndarray of shape (S,) containing the length of each
+        sequence, sorted in decreasing order
+    log_E and log_pi are the logs of Emission and the flattened Initial
+    log_A is the log of Transition prepared by 7-transitions.log_incoming
+    beam is the number of best states extended at each step, or None to
+        extend all of them, it is ignored for a sparse log_A whose steps
+        already cost O(nnz)
+
+    a finished sequence gets identity backpointers, so every path can be
+    traced back from the last step at once
+
+    Returns: path, log_P
+        path is a numpy.ndarray of shape (S, T) containing the states
+        log_P is a numpy.ndarray of shape (S,) containing the log
+            probability of each path
+    '''
+    S, T = padded.shape
+    N = log_A.shape[0]
+    back = np.empty((T, S, N), dtype=np.int32)
+    stay = np.arange(N, dtype=np.int32)
+    rows = np.arange(S)[:, np.newaxis]
+    if beam is None or beam >= N or sparse.issparse(log_A):
+        beam = None
+    # initialization δ1(j) = log πj + log bj(o1)
+    delta = log_pi + log_E[:, padded[:, 0]].T
+    for t in range(1, T):
+        running = np.searchsorted(-lengths, -t, side='left')
+        back[t, running:] = stay
+        if beam is None:
+            # δt(j) = maxi δt−1(i) + log aij + log bj(ot)
+            best, values = max_step(delta[:running], log_A)
+        else:
+            # only the beam best states of each sequence are extended
+            kept = np.argpartition(delta[:running], N - beam,
+                                   axis=1)[:, N - beam:].astype(np.int32)
+            scores = (delta[rows[:running], kept][:, :, np.newaxis] +
+                      log_A.T[kept])
+            choice = np.argmax(scores, axis=1)
+            best = kept[rows[:running], choice]
+            values = np.take_along_axis(scores, choice[:, np.newaxis], 1)
+            values = values[:, 0]
+        back[t, :running] = best
+        delta[:running] = values + log_E[:, padded[:running, t]].T
+    path = np.empty((S, T), dtype=np.int32)
+    path[:, T - 1] = np.argmax(delta, axis=1)
+    log_P = delta[np.arange(S), path[:, T - 1]]
+    for t in range(T - 1, 0, -1):
+        path[:, t - 1] = back[t, np.arange(S), path[:, t]]
+    return path, log_P
+
+
+def viterbi_batch(Observations, Emission, Transition, Initial, beam=None,
+                  max_memory=2 ** 27):
+    '''
+    calculates the most likely sequence of hidden states for many
+    sequences at once
+
+    Observations is a list of numpy.ndarray of shape (T_i,), the sequences
+        can have different lengths
+    Emission is a numpy.ndarray of shape (N, M), Transition a numpy.ndarray
+        or scipy.sparse matrix of shape (N, N) and Initial of shape (N, 1)
+    beam is the number of best states extended at each step, which cuts
+        the cost of a step from N^2 to beam * N for very large dense state
+        spaces, at the risk of missing the best path; None is exact
+        a sparse Transition is always decoded exactly in O(nnz) per step
+    max_memory is the approximate number of bytes of scores and
+        backpointers held at once, sequences are decoded in groups that
+        fit in it
+
+    the sequences are sorted by decreasing length, so the ones still
+    running are a prefix of each group and advance together
+
+    Returns: paths, log_P
+        paths is a list of numpy.ndarray of shape (T_i,) containing the
+            most likely hidden states of each sequence
+        log_P is a numpy.ndarray of shape (len(Observations),) containing
+            the log probability of each path
+        or None, None on failure
     '''
     try:
-        T = Observation.shape[0]
         N, M = Emission.shape
-
-        # backpointer initialization
-        backpointer = np.zeros((N, T))
-
-        # F == alpha
-        # initialization α1(j) = πjbj(o1) 1 ≤ j ≤ N
-        F = np.zeros((N, T))
-        F[:, 0] = Initial.T * Emission[:, Observation[0]]
-
-        # formula shorturl.at/amtJT
-        # Recursion αt(j) == ∑Ni=1 αt−1(i)ai jbj(ot); 1≤j≤N,1<t≤T
-        for t in range(1, T):
-            for n in range(N):
-                Transitions = Transition[:, n]
-                Emissions = Emission[n, Observation[t]]
-                F[n, t] = np.amax(Transitions * F[:, t - 1]
-                                  * Emissions)
-                backpointer[n, t - 1] = np.argmax(Transitions * F[:, t - 1]
-                                                  * Emissions)
-
-        # Path Array
-        path = [0 for i in range(T)]
-        # Find the most probable last hidden state
-        last_state = np.argmax(F[:, T - 1])
-        path[0] = last_state
-
-        # formula shorturl.at/uvAPU
-        backtrack_index = 1
-        for i in range(T - 2, -1, -1):
-            path[backtrack_index] = int(backpointer[int(last_state), i])
-            last_state = backpointer[int(last_state), i]
-            backtrack_index += 1
-
-        # Flip the path array using reverse to maintain main structure
-        path.reverse()
-
-        # the last of the large probability
-        P = np.amax(F[:, T - 1], axis=0)
-
-        return path, P
+        Transition = as_transition(Transition)
+        if Transition is None or Transition.shape != (N, N) or \
+                Initial.shape != (N, 1):
+            return None, None
+        if beam is not None and (type(beam) is not int or beam < 1):
+            return None, None
+        lengths = np.array([len(seq) for seq in Observations])
+        if lengths.size == 0 or np.min(lengths) == 0:
+            return None, None
+        with np.errstate(divide='ignore'):
+            log_E = np.log(Emission)
+            log_pi = np.log(Initial[:, 0])
+        log_A = log_incoming(Transition)
+        order = np.argsort(-lengths, kind='stable')
+        if sparse.issparse(log_A):
+            width = max(1, log_A.nnz // N)
+        else:
+            width = N if beam is None else min(beam, N)
+        # per sequence: float64 scores and int32 backpointers
+        per_seq = 4 * N * (2 * width + np.max(lengths))
+        group = max(1, int(max_memory // per_seq))
+        paths = [None] * lengths.size
+        log_P = np.empty(lengths.size)
+        for start in range(0, lengths.size, group):
+            members = order[start:start + group]
+            sizes = lengths[members]
+            padded = np.zeros((members.size, sizes[0]), dtype=int)
+            for i, j in enumerate(members):
+                padded[i, :sizes[i]] = Observations[j]
+            path, log_P[members] = decode(padded, sizes, log_E, log_A,
+                                          log_pi, beam)
+            for i, j in enumerate(members):
+                paths[j] = path[i, :sizes[i]]
+        return paths, log_P
     except Exception:
-        None, None
+        return None, None
+
+
+def viterbi(Observation, Emission, Transition, Initial, beam=None,
+            log=False):
+    '''
+    calculates the most likely sequence of hidden states
+    for a hidden markov model
+
+    Observation is a numpy.ndarray of shape (T,) with the observation indices
+    Emission is a numpy.ndarray of shape (N, M), Transition a numpy.ndarray
+        or scipy.sparse matrix of shape (N, N) and Initial of shape (N, 1)
+    beam is the number of best states extended at each step, see
+        viterbi_batch
+    log is True to get the log probability of the path, which does not
+        underflow on long sequences
+
+    the recursion runs in log space, every state is updated at once with
+    a single max over an (N, N) score matrix, and the backpointers are
+    kept as int32
+
+    Returns: path, P
+        path is a list of length T containing the most likely sequence of
+            hidden states
+        P is the probability of obtaining the path sequence, or its log
+            if log is True
+        or None, None on failure
+    '''
+    if type(Observation) is not np.ndarray or len(Observation.shape) != 1:
+        return None, None
+    paths, log_P = viterbi_batch([Observation], Emission, Transition,
+                                 Initial, beam)
+    if paths is None:
+        return None, None
+    path = paths[0].tolist()
+    if log:
+        return path, log_P[0]
+    return path, np.exp(log_P[0])
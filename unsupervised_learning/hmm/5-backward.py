@@ -5,24 +5,66 @@ Defines function that performs the backward algorithm for a Hidden Markov Model
 
 
 import numpy as np
+as_transition = __import__('7-transitions').as_transition
+backward_step = __import__('7-transitions').backward_step
+
+
+def scaled_backward(Observation, Emission, Transition, c=None):
+    '''
+    Performs the backward recursion with a normalization at every step
+
+    Observation is a numpy.ndarray of shape (T,) with the observation indices
+    Emission is a numpy.ndarray of shape (N, M) and Transition of shape (N, N)
+        prepared by 7-transitions.as_transition
+    c is a numpy.ndarray of shape (T,) of scaling factors, such as those of
+        3-forward.scaled_forward, so that the forward and backward
+        probabilities multiply into posteriors; if None, each step is
+        divided by its own sum
+
+    each step is one matrix-vector product, and the step that goes back
+    from t + 1 to t is divided by c[t + 1]
+
+    Returns: beta, c
+        beta is a numpy.ndarray of shape (N, T) containing the scaled
+            backward path probabilities
+        c is the numpy.ndarray of shape (T,) of scaling factors used
+    '''
+    T = Observation.shape[0]
+    N = Transition.shape[0]
+    # emission probabilities of the whole sequence, shape (T, N)
+    B = Emission[:, Observation].T
+    scale = np.ones(T) if c is None else c
+    beta = np.empty((T, N))
+    beta[T - 1] = 1
+    for t in range(T - 2, -1, -1):
+        step = backward_step(Transition, B[t + 1] * beta[t + 1])
+        if c is None:
+            scale[t + 1] = np.sum(step)
+        # an impossible suffix keeps beta at zero instead of nan
+        beta[t] = step / (scale[t + 1] if scale[t + 1] > 0 else 1)
+    return beta.T, scale
 
 
 def backward(Observation, Emission, Transition, Initial):
     '''
     Performs the backward algorithm for a hidden markov model
+
+    Transition can be a numpy.ndarray or a scipy.sparse matrix
     '''
     try:
         T = Observation.shape[0]
         N, M = Emission.shape
-        beta = np.zeros((N, T))
-        beta[:, T - 1] = np.ones((N))
-
-        for t in range(T - 2, -1, -1):
-            for n in range(N):
-                Transitions = Transition[n, :]
-                Emissions = Emission[:, Observation[t + 1]]
-                beta[n, t] = np.sum((Transitions * beta[:, t + 1]) * Emissions)
-
+        if len(Observation.shape) != 1 or T == 0:
+            return None, None
+        Transition = as_transition(Transition)
+        if Transition is None or Transition.shape != (N, N) or \
+                Initial.shape != (N, 1):
+            return None, None
+        beta, c = scaled_backward(Observation, Emission, Transition)
+        with np.errstate(divide='ignore'):
+            # undo the scaling, β(t) == beta(t) * prod(c) after t
+            log_c = np.log(c)
+        beta = beta * np.exp(np.sum(log_c) - np.cumsum(log_c))
         P = np.sum(Initial[:, 0] * Emission[:, Observation[0]] * beta[:, 0])
         return P, beta
     except Exception:
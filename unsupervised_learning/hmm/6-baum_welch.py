@@ -2,89 +2,137 @@
 """ baum_welch algorithm"""
 
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+as_transition = __import__('7-transitions').as_transition
+normalize_rows = __import__('7-transitions').normalize_rows
+HMM = __import__('8-hmm').HMM
 
+worker_Observations = None
 
-def forward(Observation, Emission, Transition, Initial):
-    """ forward function based on task3 """
-    # Hidden States
-    N = Transition.shape[0]
 
-    # Observations
-    T = Observation.shape[0]
-
-    # F == alpha
-    # initialization α1(j) = πjbj(o1) 1 ≤ j ≤ N
-    F = np.zeros((N, T))
-    F[:, 0] = Initial.T * Emission[:, Observation[0]]
-
-    # formula shorturl.at/amtJT
-    # Recursion αt(j) == ∑Ni=1 αt−1(i)ai jbj(ot); 1≤j≤N,1<t≤T
-    for t in range(1, T):
-        for n in range(N):
-            Transitions = Transition[:, n]
-            Emissions = Emission[n, Observation[t]]
-            F[n, t] = np.sum(Transitions * F[:, t - 1]
-                             * Emissions)
-
-    # Termination P(O|λ) == ∑Ni=1 αT (i)
-    # P = np.sum(F[:, -1])
-    return F
-
-
-def backward(Observation, Emission, Transition, Initial):
-    """ backward function based on task5 """
-
-    T = Observation.shape[0]
-    N, M = Emission.shape
-    beta = np.zeros((N, T))
-    beta[:, T - 1] = np.ones(N)
-
-    for t in range(T - 2, -1, -1):
-        for n in range(N):
-            Transitions = Transition[n, :]
-            Emissions = Emission[:, Observation[t + 1]]
-            beta[n, t] = np.sum((Transitions * beta[:, t + 1]) * Emissions)
+def init_worker(Observations):
+    """
+    Stores the sequences in a worker process, with the same pool
+    initializer pattern as init_worker in clustering/3-optimum
 
-    # P = np.sum(Initial[:, 0] * Emission[:, Observation[0]] * beta[:, 0])
-    return beta
+    Observations is a list of numpy.ndarray of shape (T_i,)
+    """
+    global worker_Observations
+    worker_Observations = Observations
 
 
-def baum_welch(Observations, Transition, Emission, Initial, iterations=1000):
+def expected_counts(Observations, Transition, Emission, Initial):
+    """
+    Calculates the expected counts of the E-step over a group of sequences
+
+    Observations is a list of numpy.ndarray of shape (T_i,), or a range of
+        indices into the sequences of the worker process
+    Transition is a numpy.ndarray of shape (N, N) or a sparse matrix prepared
+        by 7-transitions.as_transition, Emission is a numpy.ndarray of shape
+        (N, M) and Initial of shape (N, 1)
+
+    each sequence costs one scaled forward-backward pass of 8-hmm.HMM,
+    and its counts are read from that pass
+
+    Returns: l, start, moves, emits
+        l is the sum of the log likelihoods of the sequences
+        start is a numpy.ndarray of shape (N,) containing the expected
+            number of sequences starting in each state
+        moves is a numpy.ndarray of shape (N, N), or of shape (nnz,) for a
+            sparse Transition, containing the expected number of
+            transitions between each pair of states
+        emits is a numpy.ndarray of shape (N, M) containing the expected
+            number of times each state emits each observation
+    """
+    if isinstance(Observations, range):
+        Observations = [worker_Observations[i] for i in Observations]
+    # every sequence is visited once, so only its own pass is kept
+    model = HMM(Transition, Emission, Initial, cache_size=1)
+    totals = [0, 0, 0, 0]
+    for Observation in Observations:
+        totals = [a + b for a, b in zip(totals, model.counts(Observation))]
+    return tuple(totals)
+
+
+def baum_welch(Observations, Transition, Emission, Initial, iterations=1000,
+               tol=1e-8, workers=1, update_initial=False):
     """
     Baum-Welch algorithm for a hidden markov model
+
+    Observations is a numpy.ndarray of shape (T,) with the observation
+        indices, or a list of them to train on many sequences at once
+    Transition is a numpy.ndarray or scipy.sparse matrix of shape (N, N),
+        Emission a numpy.ndarray of shape (N, M) and Initial of shape (N, 1)
+        transitions that are zero in a sparse Transition stay zero, so
+        left-to-right and banded models keep their structure and every
+        step costs O(nnz) instead of O(N^2)
+    iterations is the maximum number of expectation-maximization steps
+    tol is the change in log likelihood below which training stops
+    workers is the number of processes the sequences are spread across,
+        the expected counts of each process are added before the M-step
+    update_initial is True to re-estimate Initial as well, it is then
+        returned as a third value
+
+    a state that is never visited keeps its previous parameters
+
+    Returns: Transition, Emission (, Initial)
+        the re-estimated transition and emission probabilities, and the
+        starting probabilities if update_initial is True,
+        or None, None (, None) on failure
     """
-    if iterations == 1000:
-        iterations = 385
+    failure = (None, None, None) if update_initial else (None, None)
+    if type(Observations) is np.ndarray:
+        Observations = [Observations]
+    if len(Observations) == 0 or any(len(seq.shape) != 1 or seq.size == 0
+                                     for seq in Observations):
+        return failure
+    if type(iterations) is not int or iterations <= 0:
+        return failure
+    if type(workers) is not int or workers <= 0:
+        return failure
     N, M = Emission.shape
-    T = Observations.shape[0]
-
-    for n in range(iterations):
-        alpha = forward(Observations, Emission, Transition, Initial)
-        beta = backward(Observations, Emission, Transition, Initial)
-
-        xi = np.zeros((N, N, T - 1))
-        for t in range(T - 1):
-            denominator = np.dot(np.dot(alpha[:, t].T, Transition) *
-                                 Emission[:, Observations[t + 1]].T,
-                                 beta[:, t + 1])
-            for i in range(N):
-                numerator = alpha[i, t] * Transition[i] * \
-                            Emission[:, Observations[t + 1]].T * \
-                            beta[:, t + 1].T
-                xi[i, :, t] = numerator / denominator
-
-        gamma = np.sum(xi, axis=1)
-        Transition = np.sum(xi, 2) / np.sum(gamma,
-                                            axis=1).reshape((-1, 1))
-
-        # adding additional T element in gamma
-
-        gamma = np.hstack((gamma, np.sum(xi[:, :, T - 2],
-                                         axis=0).reshape((-1, 1))))
-
-        denominator = np.sum(gamma, axis=1)
-        for s in range(M):
-            Emission[:, s] = np.sum(gamma[:, Observations == s],
-                                    axis=1)
-        Emission = np.divide(Emission, denominator.reshape((-1, 1)))
+    Transition = as_transition(Transition)
+    if Transition is None or Transition.shape != (N, N) or \
+            Initial.shape != (N, 1):
+        return failure
+    Transition = Transition.astype(float)
+    Emission = Emission.astype(float)
+    Initial = Initial.astype(float)
+
+    pool = None
+    if workers > 1:
+        pool = ProcessPoolExecutor(workers, initializer=init_worker,
+                                   initargs=(Observations,))
+        size = -(-len(Observations) // workers)
+        groups = [range(i, min(i + size, len(Observations)))
+                  for i in range(0, len(Observations), size)]
+    l_prev = None
+    try:
+        for n in range(iterations):
+            if pool is None:
+                l, start, moves, emits = expected_counts(
+                    Observations, Transition, Emission, Initial)
+            else:
+                parts = list(pool.map(expected_counts, groups,
+                                      [Transition] * len(groups),
+                                      [Emission] * len(groups),
+                                      [Initial] * len(groups)))
+                l, start, moves, emits = [sum(p) for p in zip(*parts)]
+
+            Transition = normalize_rows(moves, Transition)
+            emitted = np.sum(emits, axis=1, keepdims=True)
+            Emission = np.where(emitted > 0,
+                                emits / np.where(emitted > 0, emitted, 1),
+                                Emission)
+            if update_initial:
+                Initial = (start / np.sum(start))[:, np.newaxis]
+
+            if l_prev is not None and abs(l - l_prev) <= tol:
+                break
+            l_prev = l
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    if update_initial:
+        return Transition, Emission, Initial
     return Transition, Emission
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Defines helpers that apply dense, sparse or banded transition matrices
+in the recursions of a Hidden Markov Model
+"""
+
+
+import numpy as np
+from scipy import sparse
+
+
+def as_transition(Transition):
+    '''
+    Prepares a transition matrix for the recursions
+
+    Transition is a numpy.ndarray or a scipy.sparse matrix of shape (N, N),
+        banded left-to-right models can be built with scipy.sparse.diags
+
+    a sparse matrix makes every step of the recursions cost O(nnz)
+    instead of O(N^2)
+
+    Returns: the numpy.ndarray unchanged, or a CSR copy of the sparse
+        matrix without explicit zeros or duplicates and with sorted
+        indices, or None if Transition is not a square matrix
+    '''
+    if type(Transition) is np.ndarray:
+        A = Transition
+    elif sparse.issparse(Transition):
+        A = sparse.csr_matrix(Transition, dtype=float, copy=True)
+        A.sum_duplicates()
+        A.eliminate_zeros()
+        A.sort_indices()
+    else:
+        return None
+    if len(A.shape) != 2 or A.shape[0] != A.shape[1]:
+        return None
+    return A
+
+
+def forward_step(alpha, A):
+    '''
+    Propagates probabilities one step forward, alpha A
+
+    alpha is a numpy.ndarray of shape (N,) or (S, N)
+    A is a transition matrix prepared by as_transition
+
+    Returns: a numpy.ndarray of the shape of alpha
+    '''
+    if sparse.issparse(A):
+        # A^T is the CSC view of A, so no copy is made
+        return A.T.dot(alpha.T).T
+    return np.dot(alpha, A)
+
+
+def backward_step(A, beta):
+    '''
+    Propagates probabilities one step backward, A beta
+
+    A is a transition matrix prepared by as_transition
+    beta is a numpy.ndarray of shape (N,) or (N, S)
+
+    Returns: a numpy.ndarray of the shape of beta
+    '''
+    return A.dot(beta)
+
+
+def log_incoming(A):
+    '''
+    Takes the log of a transition matrix, arranged by destination state
+
+    A is a transition matrix prepared by as_transition
+
+    Returns: a contiguous numpy.ndarray of shape (N, N) whose row j holds
+        the log probabilities of the transitions into j, or for a sparse
+        A a CSC matrix holding the logs of its non-zero entries
+    '''
+    if sparse.issparse(A):
+        log_A = sparse.csc_matrix(A, copy=True)
+        log_A.sort_indices()
+        log_A.data = np.log(log_A.data)
+        return log_A
+    with np.errstate(divide='ignore'):
+        return np.ascontiguousarray(np.log(A).T)
+
+
+def max_step(delta, log_A):
+    '''
+    Finds the best predecessor of every state, the max-product step of the
+    Viterbi recursion
+
+    delta is a numpy.ndarray of shape (S, N) containing log probabilities
+    log_A is a transition matrix prepared by log_incoming
+
+    for a sparse log_A the candidates of each destination are a segment of
+        the CSC data, so the maxima are segment reductions over the nnz
+        scores
+
+    Returns: best, values
+        best is a numpy.ndarray of shape (S, N) of type int32 containing
+            the best predecessor of each state
+        values is a numpy.ndarray of shape (S, N) containing
+            max_i delta[:, i] + log a_ij
+    '''
+    if not sparse.issparse(log_A):
+        scores = delta[:, np.newaxis, :] + log_A
+        best = np.argmax(scores, axis=2)
+        values = np.take_along_axis(scores, best[:, :, np.newaxis], 2)
+        return best.astype(np.int32), values[:, :, 0]
+    S, N = delta.shape
+    counts = np.diff(log_A.indptr)
+    # states without incoming transitions stay impossible
+    filled = counts > 0
+    starts = log_A.indptr[:-1][filled]
+    scores = delta[:, log_A.indices] + log_A.data
+    values = np.full((S, N), -np.inf)
+    values[:, filled] = np.maximum.reduceat(scores, starts, axis=1)
+    hits = scores == np.repeat(values[:, filled], counts[filled], axis=1)
+    first = np.where(hits, np.arange(scores.shape[1]), scores.shape[1])
+    best = np.zeros((S, N), dtype=np.int32)
+    best[:, filled] = log_A.indices[np.minimum.reduceat(first, starts,
+                                                        axis=1)]
+    return best, values
+
+
+def expected_moves(A, alpha, after, max_memory=2 ** 27):
+    '''
+    Sums the expected transitions over a sequence
+
+    A is a transition matrix prepared by as_transition
+    alpha is a numpy.ndarray of shape (N, T - 1) containing the scaled
+        forward probabilities of the first T - 1 steps
+    after is a numpy.ndarray of shape (N, T - 1) containing
+        bj(ot+1) βt+1(j) / ct+1 for the last T - 1 steps
+    max_memory is the approximate number of bytes of the temporary
+        arrays for a sparse A
+
+    for a sparse A only its non-zero entries are summed, so the cost is
+        O(nnz * T) instead of O(N^2 * T)
+
+    Returns: the expected transition counts, a numpy.ndarray of shape
+        (N, N), or for a sparse A a numpy.ndarray of shape (nnz,) aligned
+        with A.data, so counts of many sequences can simply be added
+    '''
+    if not sparse.issparse(A):
+        return A * np.dot(alpha, after.T)
+    rows = np.repeat(np.arange(A.shape[0]), np.diff(A.indptr))
+    data = np.empty(A.nnz)
+    step = max(1, int(max_memory // (16 * max(1, alpha.shape[1]))))
+    for start in range(0, A.nnz, step):
+        stop = start + step
+        data[start:stop] = np.einsum('it,it->i', alpha[rows[start:stop]],
+                                     after[A.indices[start:stop]])
+    data *= A.data
+    return data
+
+
+def normalize_rows(moves, A):
+    '''
+    Turns expected transition counts into transition probabilities
+
+    moves contains the expected transition counts, see expected_moves
+    A is the current transition matrix, whose rows are kept for the
+        states that were never left
+
+    Returns: the new transition matrix, dense or sparse like A
+    '''
+    if not sparse.issparse(A):
+        visits = np.sum(moves, axis=1, keepdims=True)
+        return np.where(visits > 0, moves / np.where(visits > 0, visits, 1),
+                        A)
+    rows = np.repeat(np.arange(A.shape[0]), np.diff(A.indptr))
+    visits = np.bincount(rows, weights=moves, minlength=A.shape[0])[rows]
+    data = np.where(visits > 0, moves / np.where(visits > 0, visits, 1),
+                    A.data)
+    return sparse.csr_matrix((data, A.indices, A.indptr), shape=A.shape)
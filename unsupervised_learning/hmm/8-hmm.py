@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Defines a class that serves likelihoods and posteriors of a Hidden Markov
+Model from one cached forward-backward pass per sequence
+"""
+
+
+from collections import OrderedDict
+import numpy as np
+from scipy import sparse
+scaled_forward = __import__('3-forward').scaled_forward
+scaled_backward = __import__('5-backward').scaled_backward
+as_transition = __import__('7-transitions').as_transition
+expected_moves = __import__('7-transitions').expected_moves
+
+
+class HMM():
+    """
+    Hidden Markov Model whose inference queries share a cache of scaled
+        forward-backward passes
+    """
+
+    def __init__(self, Transition, Emission, Initial, cache_size=16):
+        """
+        Class constructor
+
+        parameters:
+            Transition [numpy.ndarray or scipy.sparse matrix of shape (N, N)]:
+                contains the transition probabilities
+            Emission [numpy.ndarray of shape (N, M)]:
+                contains the emission probabilities
+            Initial [numpy.ndarray of shape (N, 1)]:
+                contains the starting probabilities
+            cache_size [positive int]:
+                the number of sequences whose passes are kept, the least
+                    recently used ones are dropped first
+
+        sets the public instance attributes:
+            Transition, Emission, Initial: the model parameters
+            cache_size: the setting above
+        """
+        if type(cache_size) is not int or cache_size <= 0:
+            raise TypeError("cache_size must be a positive integer")
+        self.cache_size = cache_size
+        self.update(Transition, Emission, Initial)
+
+    def update(self, Transition, Emission, Initial):
+        """
+        Replaces the model parameters and clears the cache
+
+        parameters:
+            Transition, Emission, Initial:
+                the new parameters, see the class constructor
+        """
+        if not isinstance(Emission, np.ndarray) or len(Emission.shape) != 2:
+            raise TypeError("Emission must be a numpy.ndarray of shape "
+                            "(N, M)")
+        N = Emission.shape[0]
+        A = as_transition(Transition)
+        if A is None or A.shape != (N, N):
+            raise TypeError("Transition must be a numpy.ndarray or "
+                            "scipy.sparse matrix of shape (N, N)")
+        if not isinstance(Initial, np.ndarray) or Initial.shape != (N, 1):
+            raise TypeError("Initial must be a numpy.ndarray of shape "
+                            "(N, 1)")
+        self.Transition = A
+        self.Emission = Emission
+        self.Initial = Initial
+        self.__cache = OrderedDict()
+
+    def passes(self, Observation):
+        """
+        Runs the scaled forward-backward pass of a sequence, or reuses it
+
+        parameters:
+            Observation [numpy.ndarray of shape (T,)]:
+                contains the index of each observation
+
+        returns:
+            alpha, beta, c:
+                alpha [numpy.ndarray of shape (N, T)]:
+                    the scaled forward probabilities
+                beta [numpy.ndarray of shape (N, T)]:
+                    the scaled backward probabilities
+                c [numpy.ndarray of shape (T,)]:
+                    the scaling factors, P(O|λ) == prod(c)
+        """
+        if not isinstance(Observation, np.ndarray) or \
+                len(Observation.shape) != 1 or Observation.size == 0:
+            raise TypeError("Observation must be a non-empty numpy.ndarray "
+                            "of shape (T,)")
+        key = (Observation.dtype.str, Observation.tobytes())
+        if key in self.__cache:
+            self.__cache.move_to_end(key)
+            return self.__cache[key]
+        alpha, c = scaled_forward(Observation, self.Emission,
+                                  self.Transition, self.Initial)
+        beta, c = scaled_backward(Observation, self.Emission,
+                                  self.Transition, c)
+        self.__cache[key] = alpha, beta, c
+        if len(self.__cache) > self.cache_size:
+            self.__cache.popitem(last=False)
+        return alpha, beta, c
+
+    def log_likelihood(self, Observation):
+        """
+        Calculates log P(O|λ) of a sequence
+
+        parameters:
+            Observation [numpy.ndarray of shape (T,)]:
+                contains the index of each observation
+
+        returns:
+            [float]:
+                the log likelihood, -inf for an impossible sequence
+        """
+        alpha, beta, c = self.passes(Observation)
+        with np.errstate(divide='ignore'):
+            return np.sum(np.log(c))
+
+    def posteriors(self, Observation):
+        """
+        Calculates the posterior marginals of the hidden states
+
+        parameters:
+            Observation [numpy.ndarray of shape (T,)]:
+                contains the index of each observation
+
+        returns:
+            [numpy.ndarray of shape (N, T)]:
+                containing P(state at t == i | O, λ), each column sums to 1
+        """
+        alpha, beta, c = self.passes(Observation)
+        return alpha * beta
+
+    def pairwise(self, Observation):
+        """
+        Calculates the posteriors of consecutive pairs of hidden states
+
+        parameters:
+            Observation [numpy.ndarray of shape (T,)]:
+                contains the index of each observation
+
+        returns:
+            [numpy.ndarray of shape (T - 1, N, N)]:
+                containing P(state at t == i, state at t + 1 == j | O, λ),
+                or of shape (T - 1, nnz) aligned with Transition.data for
+                a sparse Transition
+        """
+        alpha, beta, c = self.passes(Observation)
+        after = self.Emission[:, Observation[1:]] * beta[:, 1:] / c[1:]
+        A = self.Transition
+        if sparse.issparse(A):
+            rows = np.repeat(np.arange(A.shape[0]), np.diff(A.indptr))
+            return (alpha[rows, :-1] * after[A.indices]).T * A.data
+        return (alpha[:, :-1].T[:, :, np.newaxis] * A *
+                after.T[:, np.newaxis, :])
+
+    def decode(self, Observation):
+        """
+        Finds the most likely hidden state at each step, which unlike the
+            Viterbi path maximizes the expected number of correct states
+
+        parameters:
+            Observation [numpy.ndarray of shape (T,)]:
+                contains the index of each observation
+
+        returns:
+            [numpy.ndarray of shape (T,)]:
+                containing the most likely hidden state at each step
+        """
+        return np.argmax(self.posteriors(Observation), axis=0)
+
+    def counts(self, Observation):
+        """
+        Calculates the expected counts of a sequence for Baum-Welch
+
+        parameters:
+            Observation [numpy.ndarray of shape (T,)]:
+                contains the index of each observation
+
+        returns:
+            l, start, moves, emits:
+                l [float]:
+                    the log likelihood of the sequence
+                start [numpy.ndarray of shape (N,)]:
+                    the posterior of the first hidden state
+                moves [numpy.ndarray]:
+                    the expected transition counts, see
+                        7-transitions.expected_moves
+                emits [numpy.ndarray of shape (N, M)]:
+                    the expected number of times each state emits each
+                        observation
+        """
+        alpha, beta, c = self.passes(Observation)
+        gamma = alpha * beta
+        # ξt(i, j) == αt(i) aij bj(ot+1) βt+1(j) / ct+1, summed over t
+        after = self.Emission[:, Observation[1:]] * beta[:, 1:] / c[1:]
+        moves = expected_moves(self.Transition, alpha[:, :-1], after)
+        emits = np.zeros(self.Emission.shape)
+        for s in range(self.Emission.shape[1]):
+            emits[:, s] = np.sum(gamma[:, Observation == s], axis=1)
+        return self.log_likelihood(Observation), gamma[:, 0], moves, emits